@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON读写模块
+优先使用orjson（C实现）序列化，未安装时回退到标准库json
+"""
+
+import json
+import mmap
+import os
+import threading
+from typing import Any, Union
+
+try:
+    import orjson  # 可选依赖
+except ImportError:
+    orjson = None
+
+# 不小于该大小的文件以只读内存映射交给orjson解析（小文件直接读入更快）
+_MMAP_MIN_SIZE = 1 << 20
+
+
+def dumps(obj: Any, indent: bool = True) -> bytes:
+    """序列化为UTF-8字节串；indent=False 时输出紧凑格式"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """反序列化JSON字节串或字符串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(file_path: str) -> Any:
+    """读取并解析JSON文件（大文件且有orjson时直接解析内存映射，省去整个文件读入bytes的一次拷贝）"""
+    with open(file_path, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            return loads(f.read())
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+        finally:
+            mm.close()
+
+
+def dump_file(file_path: str, obj: Any, indent: bool = True):
+    """将对象写入JSON文件（先写临时文件并fsync，再 os.replace，断电或中断也不会留下写了一半的文件）"""
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps(obj, indent=indent))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -5,23 +5,133 @@ LLM规划模块
 负责识别核心页面类型和推荐核心URLs
 """
 
+import functools
+import hashlib
+import itertools
 import json
 import logging
 import os
 import re
 import urllib.parse
 import random
+from collections import Counter
 from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from openai import OpenAI
 import pathlib
 
+import json_io
+
+try:
+    import re2  # 可选依赖：google-re2（DFA引擎，线性时间匹配）
+except ImportError:
+    re2 = None
+
+
+# Wayback URL：/web/<时间戳>/<原始URL>
+_WAYBACK_RE = re.compile(r"/web/\d+/(https?://.*)")
+# 修正 http:/、https:/ 缺少斜杠的常见错误
+_SCHEME_FIX_RE = re.compile(r"^(https?):/(?!/)")
+# 一次匹配拆出 netloc / path / ?query（代替逐个构造 urlparse 结果）
+_URL_RE = re.compile(r"^https?://([^/?#]*)([^?#]*)(\?[^#]*)?", re.IGNORECASE)
+# 常见情况一次匹配：可选的 Wayback 前缀 + 原始URL（兼容 http:/ 单斜杠）的 netloc / path / ?query
+_URL_SPLIT_RE = re.compile(
+    r"^(https?://web\.archive\.org/web/\d+/)?https?:/{1,2}([^/?#]*)([^?#]*)(\?[^#]*)?", re.IGNORECASE
+)
+# 路径模板归一化：日期段、纯数字段、查询参数值
+_DATE_SEGMENT_RE = re.compile(r"/\d{4}-\d{2}-\d{2}(?=/|$)")
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+_QUERY_VALUE_RE = re.compile(r"=[^&]*")
+# 从LLM响应中截取JSON值（raw_decode 返回解析结束位置，允许其后还有其他文本）
+_JSON_DECODER = json.JSONDecoder()
+_JSON_START_RE = re.compile(r"[\[{]")
+# 单次LLM请求最多合并的年份数（年份过多时长上下文下的选择质量明显下降）
+_MAX_YEARS_PER_REQUEST = 8
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_host(netloc: str) -> str:
+    """域名小写并去掉端口号和www前缀（同一站点的netloc种类很少，结果直接缓存）"""
+    host = netloc.lower()
+    if ":" in host:
+        host = host.split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_wildcard_pattern(raw_pat: str) -> Optional["re.Pattern"]:
+    """将含通配符 * 的URL模式编译为正则（不同阶段/类型的相同模式共用同一对象）；无效模式返回None"""
+    try:
+        return re.compile(re.escape(raw_pat).replace(r"\*", ".*"), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+@functools.lru_cache(maxsize=64)
+def _load_json_cached(path: str, mtime_ns: int, size: int) -> Dict:
+    """按 (路径, 修改时间, 大小) 缓存解析后的JSON文件，文件更新后自动重新解析（调用方不应修改返回值）"""
+    return json_io.load_file(path)
+
+
+@functools.lru_cache(maxsize=100_000)
+def _unwrap_wayback(url: str) -> Tuple[str, str]:
+    """拆分URL，返回 (真实站点域名, 路径+查询串)；Wayback URL 先还原为原始URL，无法还原时返回 ("", url)"""
+    m = _URL_SPLIT_RE.match(url)
+    if m and (m.group(1) or "web.archive.org" not in url):
+        _, netloc, path, query = m.groups()
+        return _normalize_host(netloc), _join_real_part(path, query)
+    
+    # 其余形式（非标准 Wayback 前缀、无scheme等）逐步解析
+    if "web.archive.org" in url:
+        m = _WAYBACK_RE.search(url)
+        if not m:
+            return "", url
+        url = _SCHEME_FIX_RE.sub(r"\1://", m.group(1))
+    
+    m = _URL_RE.match(url)
+    if not m:
+        parsed = urllib.parse.urlparse(url)
+        real_part = parsed.path or "/"
+        if parsed.query:
+            real_part += '?' + parsed.query
+        return _normalize_host(parsed.netloc), real_part
+    
+    netloc, path, query = m.groups()
+    return _normalize_host(netloc), _join_real_part(path, query)
+
+
+def _join_real_part(path: str, query: Optional[str]) -> str:
+    """拼接路径与查询串（与 urlparse 一致：末段路径中的 ;params 不计入路径，空查询串忽略）"""
+    if ";" in path:
+        params_start = path.find(";", path.rfind("/"))
+        if params_start >= 0:
+            path = path[:params_start]
+    real_part = path or "/"
+    if query and len(query) > 1:
+        real_part += query
+    return real_part
+
+
+SYSTEM_PROMPT = "You are a professional e-commerce website analysis expert, skilled in differentiated analysis for different years. Please respond in English and strictly follow the required JSON format."
+
 
 class LLMPlanner:
     """LLM规划器"""
     
-    def __init__(self, api_key: str, base_url: str = "https://openrouter.ai/api/v1"):
-        """初始化LLM规划器"""
+    def __init__(self, api_key: str, base_url: str = "https://openrouter.ai/api/v1", cache_dir: Optional[str] = None,
+                 llm_cache: bool = True):
+        """
+        初始化LLM规划器
+        
+        Args:
+            api_key: OpenRouter API密钥
+            base_url: API地址
+            cache_dir: LLM响应缓存目录；为空时使用 outputs/<company>/.llm_cache
+            llm_cache: 是否启用LLM响应缓存；为False时每次都重新请求且不写缓存
+        """
         self.client = OpenAI(
             api_key=api_key,
             base_url=base_url
@@ -33,12 +143,30 @@ class LLMPlanner:
         self.high_model = "google/gemini-2.5-pro"          # 高性能模型（核心页面类型识别）
         self.medium_model = "openai/gpt-4o-mini"           # 中等性能模型（URL推荐）
         
+        # 核心页面类型识别时送入prompt的最大URL模板数
+        self.max_prompt_templates = 3000
+        
         # 核心页面类型存储
         self.core_page_types = []
         self.core_page_types_nested = {}
+        self._core_types_source: Optional[Tuple[str, int, int]] = None  # 上次加载的文件 (路径, 修改时间, 大小)
         
         # 编译后的正则表达式模式
         self._compiled_patterns = None
+        self._compiled_fingerprint: Optional[str] = None  # 编译时核心页面类型内容的摘要，内容变化时重新编译
+        self._combined_regex = None
+        self._combined_index: List[int] = []
+        self._prefix_table: Dict[int, Dict[str, int]] = {}
+        self._prefix_lengths: List[int] = []
+        self._pattern_meta: List[Tuple[str, str]] = []
+        # 分类结果缓存：路径+查询串 -> 命中的模式序号（None 表示无匹配），跨年份复用，模式重新编译时清空
+        self._classification_cache: Dict[str, Optional[int]] = {}
+        
+        # LLM响应缓存（磁盘 + 本次运行内存）；置为False时每次都重新请求且不写缓存
+        self.llm_cache_enabled = llm_cache
+        self.cache_dir = cache_dir
+        self._active_cache_dir = cache_dir
+        self._memory_cache: Dict[str, str] = {}
         
         self.logger.info(f"🚀 LLM规划器已初始化")
     
@@ -50,6 +178,7 @@ class LLMPlanner:
         output_dir = os.path.join("outputs", company_url)
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, f"{company_url}_core_page_types.json")
+        self._active_cache_dir = self.cache_dir or os.path.join(output_dir, ".llm_cache")
         
         # 检查是否已存在结果
         if os.path.exists(output_file):
@@ -57,13 +186,14 @@ class LLMPlanner:
             self._load_core_page_types(output_file)
             return output_file
         
-        # 合并并抽样 URL
-        merged = []
-        for links in year_links_map.values():
-            merged.extend(links)
-        unique_links = list(dict.fromkeys(merged))  # 保序去重
-        sample_links = unique_links[:]
-        random.shuffle(sample_links)  # 随机打乱顺序
+        # 合并并抽样 URL（跨年份链接串联后一次保序去重，不构造中间合并列表）
+        unique_links = list(dict.fromkeys(itertools.chain.from_iterable(year_links_map.values())))
+
+        # 按路径模板聚合，每个模板保留一个代表URL及其出现次数
+        templates = self._summarize_url_templates(unique_links, top_k=self.max_prompt_templates)
+        self.logger.info(f"🧩 URL模板聚合: {len(unique_links)} 个URL -> {len(templates)} 个模板")
+        # random.sample 一次性得到随机顺序，无需先复制再原地打乱
+        sample_links = [f"{exemplar} (x{count})" for _, exemplar, count in random.sample(templates, len(templates))]
 
         sample_block = "\n".join(sample_links)
 
@@ -74,7 +204,7 @@ class LLMPlanner:
             f"For better readability, structure the final JSON as *nested by stage*:\n"
             f"```json\n{{\n  \"Awareness Stage\": [\n    {{\n      \"type_name\": \"Home\",\n      \"typical_url_patterns\": [\"/\"]\n    }}\n  ],\n  \"Interest Stage\": [],\n  \"Consideration Stage\": [],\n  \"Decision Stage\": [],\n  \"Fulfillment Stage\": [],\n  \"Retention Stage\": []\n}}\n```\n"
             f"Explanation: keys are the six customer-journey stages; each value is an array of page-type objects containing *type_name* and *typical_url_patterns*. Do NOT include any other keys.\n\n"
-            f"# Sample internal links (first {len(sample_links)})\n{sample_block}"
+            f"# Sample internal links (one exemplar per URL template, (xN) = number of URLs sharing the template; {len(sample_links)} templates)\n{sample_block}"
         )
 
         # 调用高性能LLM
@@ -92,14 +222,14 @@ class LLMPlanner:
             "total_types": len(self.core_page_types)
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
+        json_io.dump_file(output_file, result_data)
         
         self.logger.info(f"✅ 核心页面类型识别完成，共 {len(self.core_page_types)} 个类型已保存到: {output_file}")
         return output_file
 
     def _process_core_page_types_response(self, parsed: Dict):
         """处理LLM响应，构建核心页面类型数据结构"""
+        self._core_types_source = None  # 内容来自LLM响应，不再对应已加载的文件
         if "core_page_types" in parsed:
             # 旧格式：平铺列表
             flat_list = parsed["core_page_types"]
@@ -127,27 +257,26 @@ class LLMPlanner:
             self.core_page_types = transformed
     
     def _load_core_page_types(self, file_path: str):
-        """从文件加载核心页面类型"""
+        """从文件加载核心页面类型（与上次加载的文件相同且未修改时直接跳过）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            st = os.stat(file_path)
+            source = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+            if self.core_page_types and source == self._core_types_source:
+                return
             
+            data = _load_json_cached(*source)
             nested = data.get("core_page_types", {})
-            flat = []
-            for stage, items in nested.items():
-                for it in items:
-                    item_cp = it.copy()
-                    item_cp["related_journey_stage"] = stage
-                    flat.append(item_cp)
+            flat = [dict(it, related_journey_stage=stage) for stage, items in nested.items() for it in items]
             
             self.core_page_types_nested = nested
             self.core_page_types = flat
+            self._core_types_source = source
             self.logger.info(f"✅ 从文件加载核心页面类型: {len(flat)} 个类型")
             
         except Exception as e:
             self.logger.error(f"❌ 加载核心页面类型失败: {e}")
 
-    def generate_llm_planning(self, year_links_map: Dict[str, List[str]], company_url: str, crawl_num: int = 15) -> str:
+    def generate_llm_planning(self, year_links_map: Dict[str, List[str]], company_url: str, crawl_num: int = 15, max_workers: int = 8, years_per_request: int = 1) -> str:
         """
         生成LLM规划结果并保存
         
@@ -155,6 +284,8 @@ class LLMPlanner:
             year_links_map: 年份到链接列表的映射
             company_url: 公司URL标识符
             crawl_num: 每年推荐的核心URL数量
+            max_workers: 并发执行的最大LLM请求数（受API限流约束）
+            years_per_request: 每次LLM请求合并的年份数，>1 时共享同一份规则与schema前缀（上限 _MAX_YEARS_PER_REQUEST）
             
         Returns:
             输出文件路径
@@ -165,13 +296,13 @@ class LLMPlanner:
         output_dir = os.path.join("outputs", company_url)
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, f"{company_url}_llm_planning.json")
+        self._active_cache_dir = self.cache_dir or os.path.join(output_dir, ".llm_cache")
         
         # 检查是否已存在结果
         existing_results = {}
         if os.path.exists(output_file):
             try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = json_io.load_file(output_file)
                 existing_results = data.get("yearly_analysis_results", {})
                 self.logger.info(f"✅ 加载已存在的规划结果: {len(existing_results)} 年")
             except Exception as e:
@@ -188,53 +319,128 @@ class LLMPlanner:
         # 编译正则表达式模式
         self._compile_core_type_patterns()
         
-        # 按年处理
+        # 按年处理（各年份互相独立，并发调用LLM）
         yearly_analysis = existing_results.copy()
+        dirty = False  # 本次运行是否新增了年份结果（没有新增且文件已存在时不再重写）
         
+        pending_years: List[Tuple[str, List[str]]] = []
         for year, valid_links in year_links_map.items():
             if year in yearly_analysis:
                 self.logger.info(f"⏩ {year} 年规划已存在，跳过")
                 continue
-            
-            self.logger.info(f"🔍 处理 {year} 年的规划...")
-            
-            try:
-                # 分类候选URLs
-                classified_urls = self._classify_candidate_urls(year, valid_links)
-                
-                # LLM选择核心URLs
-                llm_analysis = self._select_core_urls_from_classification(year, classified_urls, crawl_num)
-                
-                # 优化爬取策略
-                final_analysis = self._optimize_crawl_strategy(llm_analysis, valid_links, year, enforce_in_valid=False)
-                
-                # 合并classified_urls中的信息（方便后续排查）
-                final_analysis["classified_urls_count"] = len(classified_urls) 
-                final_analysis["classified_urls"] = classified_urls
-
-                yearly_analysis[year] = final_analysis
-                
-                self.logger.info(f"✅ {year} 年规划完成: 推荐 {len(final_analysis.get('recommended_crawl_pages', []))} 个核心URL")
-                
-                # 增量写入、断点续跑
-                self._write_planning_file(output_file, company_url, yearly_analysis)
-                
-            except Exception as e:
-                self.logger.error(f"❌ {year} 年规划失败: {e}")
-                # 失败时不保存该年份结果，让后续运行重新尝试
+            if len(valid_links) <= crawl_num:
+                # 链接数不超过推荐数量时LLM本就会全部返回，跳过分类与LLM选择
+                yearly_analysis[year] = self._trivial_all(year, valid_links)
+                dirty = True
+                continue
+            pending_years.append((year, valid_links))
+        
+        # 每 years_per_request 个年份合并为一次LLM请求
+        step = max(1, min(years_per_request, _MAX_YEARS_PER_REQUEST))
+        batches = [pending_years[i:i + step] for i in range(0, len(pending_years), step)]
+        
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+                futures = {
+                    executor.submit(self._plan_year_batch, batch, crawl_num): [year for year, _ in batch]
+                    for batch in batches
+                }
+                # 结果在主线程中按完成顺序汇总，无需额外加锁
+                for future in as_completed(futures):
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        self.logger.error(f"❌ {', '.join(futures[future])} 年规划失败: {e}")
+                        # 失败时不保存该年份结果，让后续运行重新尝试
+                        continue
+                    if not batch_results:
+                        continue
+                    
+                    yearly_analysis.update(batch_results)
+                    dirty = True
+                    # 增量写入、断点续跑
+                    self._write_planning_file(output_file, company_url, yearly_analysis)
         
-        # 最终汇总保存（再次写入，确保时间戳为最终完成时间）
-        self._write_planning_file(output_file, company_url, yearly_analysis)
+        # 最终汇总保存（再次写入，确保时间戳为最终完成时间）；所有年份均已存在或全部失败时跳过
+        if dirty or not os.path.exists(output_file):
+            self._write_planning_file(output_file, company_url, yearly_analysis, indent=True)
+        else:
+            self.logger.info(f"⏩ 规划结果无变化，跳过写入: {output_file}")
         total_urls = sum(len(data.get("recommended_crawl_pages", [])) for data in yearly_analysis.values())
         self.logger.info(f"💾 LLM规划全部年份处理完成，共 {total_urls} 个推荐URL已保存到: {output_file}")
         
         return output_file
     
+    def _plan_one_year(self, year: str, valid_links: List[str], crawl_num: int) -> Dict:
+        """完成单个年份的规划：分类候选URL -> LLM选择 -> 生成最终爬取列表"""
+        self.logger.info(f"🔍 处理 {year} 年的规划...")
+        
+        # 分类候选URLs
+        classified_urls = self._classify_candidate_urls(year, valid_links)
+        
+        # LLM选择核心URLs
+        llm_analysis = self._select_core_urls_from_classification(year, classified_urls, crawl_num)
+        
+        return self._build_year_analysis(year, valid_links, classified_urls, llm_analysis)
+    
+    def _plan_year_batch(self, batch: List[Tuple[str, List[str]]], crawl_num: int) -> Dict[str, Dict]:
+        """一次LLM调用规划多个年份；批量结果缺失或解析失败的年份回退为单年调用"""
+        if len(batch) == 1:
+            year, valid_links = batch[0]
+            return {year: self._plan_one_year(year, valid_links, crawl_num)}
+        
+        self.logger.info(f"🔍 批量处理 {', '.join(year for year, _ in batch)} 年的规划...")
+        classified_by_year = {year: self._classify_candidate_urls(year, valid_links) for year, valid_links in batch}
+        
+        try:
+            batched_analysis = self._select_core_urls_batched(classified_by_year, crawl_num)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 批量选择核心URLs失败，回退为逐年调用: {e}")
+            batched_analysis = {}
+        
+        results: Dict[str, Dict] = {}
+        for year, valid_links in batch:
+            try:
+                llm_analysis = batched_analysis.get(year)
+                if not llm_analysis:
+                    self.logger.warning(f"⚠️ 批量结果缺少 {year} 年，回退为单年调用")
+                    llm_analysis = self._select_core_urls_from_classification(year, classified_by_year[year], crawl_num)
+                results[year] = self._build_year_analysis(year, valid_links, classified_by_year[year], llm_analysis)
+            except Exception as e:
+                # 失败时不保存该年份结果，让后续运行重新尝试
+                self.logger.error(f"❌ {year} 年规划失败: {e}")
+        return results
+    
+    def _trivial_all(self, year: str, valid_links: List[str]) -> Dict:
+        """直接推荐全部有效URL（不调用LLM）"""
+        llm_analysis = {
+            "core_url_recommendations": {
+                "recommended_url_list": list(valid_links),
+                "total_recommendations": len(valid_links)
+            }
+        }
+        final_analysis = self._optimize_crawl_strategy(llm_analysis, valid_links, year, enforce_in_valid=False)
+        final_analysis["using_real_llm"] = False
+        final_analysis["classified_urls_count"] = 0
+        final_analysis["classified_urls"] = []
+        
+        self.logger.info(f"✅ {year} 年仅 {len(valid_links)} 个有效URL，跳过LLM选择，全部推荐")
+        return final_analysis
+    
+    def _build_year_analysis(self, year: str, valid_links: List[str], classified_urls: List[Dict], llm_analysis: Dict) -> Dict:
+        """根据LLM选择结果生成单个年份的最终规划记录"""
+        # 优化爬取策略
+        final_analysis = self._optimize_crawl_strategy(llm_analysis, valid_links, year, enforce_in_valid=False)
+        
+        # 合并classified_urls中的信息（方便后续排查）
+        final_analysis["classified_urls_count"] = len(classified_urls) 
+        final_analysis["classified_urls"] = classified_urls
+        
+        self.logger.info(f"✅ {year} 年规划完成: 推荐 {len(final_analysis.get('recommended_crawl_pages', []))} 个核心URL")
+        return final_analysis
+    
     def _compile_core_type_patterns(self):
-        """编译核心页面类型的正则表达式模式"""
-        if self._compiled_patterns:
-            return
-
+        """编译核心页面类型的正则表达式模式（核心页面类型内容未变化时直接复用上次结果）"""
         # 确保有嵌套映射
         nested: Dict[str, List[Dict]] = self.core_page_types_nested
         if not nested:
@@ -246,7 +452,11 @@ class LLMPlanner:
                 nested.setdefault(stage, []).append(item_cp)
             self.core_page_types_nested = nested
 
-        compiled: List[Tuple[str, str, "re.Pattern", int]] = []
+        fingerprint = hashlib.sha1(json_io.dumps(nested, indent=False)).hexdigest()
+        if self._compiled_patterns is not None and fingerprint == self._compiled_fingerprint:
+            return
+
+        compiled: List[Tuple[str, str, Optional[str], Optional["re.Pattern"], int]] = []
 
         for stage, type_list in nested.items():
             for type_obj in type_list:
@@ -254,22 +464,53 @@ class LLMPlanner:
                 for raw_pat in type_obj.get("typical_url_patterns", []):
                     # 特殊处理根路径模式
                     if raw_pat.strip() == "/":
-                        pat_regex = r"^/$"  # 严格匹配根路径
-                    else:
-                        # 转换通配符模式为正则表达式
-                        pat_regex = re.escape(raw_pat).replace(r"\\*", ".*")
-                    
-                    try:
-                        regex = re.compile(pat_regex, re.IGNORECASE)
-                    except re.error:
+                        compiled.append((stage, type_name, None, re.compile(r"^/$"), len(raw_pat)))  # 严格匹配根路径
+                        continue
+
+                    # 纯前缀模式（除末尾*外无通配符）：走前缀哈希表，无需正则
+                    prefix = raw_pat[:-1] if raw_pat.endswith("*") else raw_pat
+                    if "*" not in prefix:
+                        compiled.append((stage, type_name, prefix.lower(), None, len(raw_pat)))
+                        continue
+
+                    # 转换通配符模式为正则表达式
+                    regex = _compile_wildcard_pattern(raw_pat)
+                    if regex is None:
                         self.logger.debug(f"⚠️ 无效的正则表达式模式 {raw_pat}，跳过")
                         continue
                     
-                    compiled.append((stage, type_name, regex, len(raw_pat)))
+                    compiled.append((stage, type_name, None, regex, len(raw_pat)))
 
         # 按模式长度排序，确保更具体的模式优先匹配
-        compiled.sort(key=lambda x: -x[3])
+        compiled.sort(key=lambda x: -x[4])
         self._compiled_patterns = compiled
+        self._compiled_fingerprint = fingerprint
+        self._classification_cache = {}
+        self._pattern_meta = [(stage, type_name) for stage, type_name, _, _, _ in compiled]
+
+        # 前缀模式按长度分桶：{前缀长度: {小写前缀: 模式序号}}，同一前缀保留优先级最高（序号最小）的模式
+        prefix_table: Dict[int, Dict[str, int]] = {}
+        residual: List[Tuple[int, "re.Pattern"]] = []
+        for i, (_, _, prefix, regex, _) in enumerate(compiled):
+            if prefix is not None:
+                prefix_table.setdefault(len(prefix), {}).setdefault(prefix, i)
+            else:
+                residual.append((i, regex))
+        self._prefix_table = prefix_table
+        self._prefix_lengths = sorted(prefix_table)
+
+        # 其余通配符模式合并为单个命名分组的交替正则：一次match即可定位优先级最高的命中模式
+        self._combined_index = [i for i, _ in residual]
+        self._combined_regex = None
+        if residual:
+            combined_pattern = "|".join(f"(?P<p{i}>{regex.pattern})" for i, regex in residual)
+            if re2 is not None:
+                try:
+                    self._combined_regex = re2.compile(combined_pattern, re2.IGNORECASE)
+                except Exception as e:
+                    self.logger.debug(f"⚠️ re2 编译合并正则失败，回退到 re: {e}")
+            if self._combined_regex is None:
+                self._combined_regex = re.compile(combined_pattern, re.IGNORECASE)
     
     def _classify_candidate_urls(self, year: str, valid_links: List[str], homepage_url: str = "") -> List[Dict]:
         """使用正则表达式模式分类候选URLs"""
@@ -280,95 +521,97 @@ class LLMPlanner:
         if homepage_url:
             home_host = self._get_home_host(homepage_url)
 
+        if not self._pattern_meta:
+            self.logger.info(f"✅ URL正则匹配完成，无可用模式，共过滤出0/{len(valid_links)}个classified_urls")
+            return results
+
+        # 热循环中用到的属性与方法预先绑定为局部变量
+        match = self._combined_regex.match if self._combined_regex is not None else None
+        combined_index = self._combined_index
+        prefix_table = self._prefix_table
+        prefix_lengths = self._prefix_lengths
+        pattern_meta = self._pattern_meta
+        cache = self._classification_cache
+        miss = object()
+        append = results.append
+        split_url = _unwrap_wayback
+
         for url in valid_links:
-            # 提取真实站点路径
-            real_part = url
-            candidate_host = ""
-            
-            if "web.archive.org" in url:
-                # 从Wayback URL中提取原始URL
-                m = re.search(r"/web/\d+/(https?://.*)", url)
-                if m:
-                    underlying = m.group(1)
-                    # 修正常见错误
-                    if underlying.startswith("http:/") and not underlying.startswith("http://"):
-                        underlying = underlying.replace("http:/", "http://", 1)
-                    if underlying.startswith("https:/") and not underlying.startswith("https://"):
-                        underlying = underlying.replace("https:/", "https://", 1)
-                    
-                    parsed_under = urllib.parse.urlparse(underlying)
-                    candidate_host = parsed_under.netloc.lower()
-                    
-                    # 去掉端口号和www前缀
-                    if ":" in candidate_host:
-                        candidate_host = candidate_host.split(":")[0]
-                    if candidate_host.startswith("www."):
-                        candidate_host = candidate_host[4:]
-                    
-                    # 为regex匹配做准备
-                    real_part = parsed_under.path
-                    if real_part == "":
-                        real_part = "/"
-                    if parsed_under.query:
-                        real_part += '?' + parsed_under.query
-                # else:
-                #     # Fall back to stripping manually
-                #     real_part = re.sub(r"^https://web\.archive\.org/web/\d+/", "", url)
-            else:
-                parsed = urllib.parse.urlparse(url)
-                candidate_host = parsed.netloc.lower()
-                real_part = parsed.path
-                if real_part == "":
-                    real_part = "/"
-                if parsed.query:
-                    real_part += '?' + parsed.query
-
-            # 域名过滤
-            if home_host and candidate_host and candidate_host != home_host and candidate_host != f"www.{home_host}":
+            # 提取真实站点域名与路径
+            candidate_host, real_part = split_url(url)
+
+            # 域名过滤（两侧均已去除 www. 与端口，一次相等比较即可；子域名不计入主站）
+            if home_host and candidate_host and candidate_host != home_host:
                 continue
 
-            # 正则匹配
-            matched = False
-            for stage, type_name, regex, pattern_len in self._compiled_patterns:
-                if regex.match(real_part):
-                    results.append({
-                        'url': url,
-                        'customer_journey_stage': stage,
-                        'type_name': type_name
-                    })
-                    matched = True
-                    break
+            # 其他年份已出现过的路径直接复用分类结果
+            best = cache.get(real_part, miss)
+            if best is miss:
+                # 前缀匹配：逐个前缀长度查表，取序号最小（优先级最高）的命中模式；
+                # 最长的命中前缀未必优先级最高（如 "/ab*" 排在 "/abc" 之前），不能首个命中即停
+                best = None
+                lowered = real_part.lower()
+                n = len(lowered)
+                for length in prefix_lengths:  # 升序：超过路径长度后更长的前缀都不可能命中
+                    if length > n:
+                        break
+                    idx = prefix_table[length].get(lowered[:length])
+                    if idx is not None and (best is None or idx < best):
+                        best = idx
+
+                # 通配符模式（合并正则；各模式内部无捕获组，lastindex-1 即命中的分组序号），取优先级更高者
+                if match is not None:
+                    m = match(real_part)
+                    if m:
+                        idx = combined_index[m.lastindex - 1]
+                        if best is None or idx < best:
+                            best = idx
+                cache[real_part] = best
+
+            if best is not None:
+                stage, type_name = pattern_meta[best]
+                append({
+                    'url': url,
+                    'customer_journey_stage': stage,
+                    'type_name': type_name
+                })
 
         self.logger.info(f"✅ URL正则匹配完成，共过滤出{len(results)}/{len(valid_links)}个classified_urls")
         return results
     
+    def _canonicalize_path(self, url: str) -> str:
+        """将URL归一化为路径模板：去掉Wayback前缀，数字ID替换为{id}，日期替换为{date}，查询参数值替换为{v}"""
+        host, real_part = _unwrap_wayback(url)
+        path, _, query = real_part.partition("?")
+        
+        path = path.lower()
+        path = _DATE_SEGMENT_RE.sub("/{date}", path)
+        path = _ID_SEGMENT_RE.sub("/{id}", path)
+        if query:
+            path += "?" + _QUERY_VALUE_RE.sub("={v}", query.lower())
+        
+        return f"{host}{path}"
+    
+    def _summarize_url_templates(self, urls: List[str], top_k: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """按路径模板聚合URL，返回按出现次数降序的 (模板, 代表URL, 次数) 列表"""
+        counter: Counter = Counter()
+        exemplars: Dict[str, str] = {}
+        for url in urls:
+            template = self._canonicalize_path(url)
+            counter[template] += 1
+            exemplars.setdefault(template, url)
+        
+        return [(template, exemplars[template], count) for template, count in counter.most_common(top_k)]
+    
     def _get_home_host(self, homepage_url: str) -> str:
         """获取主页对应的主域名"""
-        parsed = urllib.parse.urlparse(homepage_url)
-        host = parsed.netloc.lower()
-
-        # 处理Wayback URL
-        if 'web.archive.org' in host:
-            m = re.search(r"/web/\d+/(https?://[^/]+)", homepage_url)
-            if m:
-                underlying = m.group(1)
-                # 修正常见错误
-                if underlying.startswith("http:/") and not underlying.startswith("http://"):
-                    underlying = underlying.replace("http:/", "http://", 1)
-                if underlying.startswith("https:/") and not underlying.startswith("https://"):
-                    underlying = underlying.replace("https:/", "https://", 1)               
-                host = urllib.parse.urlparse(underlying).netloc.lower()
-
-        # 去掉端口号和www前缀
-        if ':' in host:
-            host = host.split(':')[0]
-        if host.startswith('www.'):
-            host = host[4:]
-        return host
+        return _unwrap_wayback(homepage_url)[0]
     
     def _select_core_urls_from_classification(self, year: str, classified_urls: List[Dict], crawl_num: int = 15) -> Dict:
         """调用LLM选择最具代表性的URLs"""
-        classification_json = json.dumps(classified_urls, ensure_ascii=False, indent=2)
+        collapsed_urls = self._collapse_classified_urls(classified_urls)
+        
+        classification_json = json_io.dumps(collapsed_urls, indent=False).decode("utf-8")
 
         prompt = (
             f"You are a highly precise e-commerce analysis engine. Based on the classified URL list below, select the most core and important {crawl_num} URLs.\n\n"
@@ -382,16 +625,60 @@ class LLMPlanner:
             f"4. Please choose English URLs only."
             # f"4. [IMPORTANT!!!] Final count **must be exactly {crawl_num}** (unless total classified URLs < {crawl_num}, then return all"
             f"</selection_rules>\n\n"
-            f"<classified_urls total=\"{len(classified_urls)}\">\n```json\n{classification_json}\n```\n</classified_urls>\n\n"
+            f"<classified_urls total=\"{len(collapsed_urls)}\">\n```json\n{classification_json}\n```\n</classified_urls>\n\n"
             f"<output_format_instructions>Output ONLY the JSON object starting with '{{' and ending with '}}', using the schema: \n"
             f"{{\n  \"core_url_recommendations\": {{\n    \"recommended_url_list\": [\n      {{\n        \"url\": \"...\",\n        \"customer_journey_stage\": \"...\",\n        \"type_name\": \"...\",\n        \"selection_reason\": \"...\"\n      }}\n    ],\n    \"total_recommendations\": {crawl_num},\n    \"coverage_scenario_types\": [\"Awareness\", \"Interest\", \"Consideration\", \"Decision\", \"Fulfillment\", \"Retention\"]\n }}\n}}\n"
             f"</output_format_instructions>"
         )
         
-        llm_resp = self._call_llm(prompt, model=self.medium_model, task_tag="选择核心URLs")
+        llm_resp = self._call_llm(prompt, model=self.medium_model, task_tag="选择核心URLs", max_tokens=4096, json_mode=True)
         parsed = self._parse_llm_response(llm_resp)
         return parsed
     
+    def _select_core_urls_batched(self, years_classified: Dict[str, List[Dict]], crawl_num: int = 15) -> Dict[str, Dict]:
+        """一次LLM调用为多个年份选择核心URLs，返回 {year: llm_analysis}"""
+        year_blocks = []
+        for year, classified_urls in years_classified.items():
+            collapsed_urls = self._collapse_classified_urls(classified_urls)
+            classification_json = json_io.dumps(collapsed_urls, indent=False).decode("utf-8")
+            year_blocks.append(f"<year id=\"{year}\" total=\"{len(collapsed_urls)}\">\n```json\n{classification_json}\n```\n</year>")
+        year_ids = ", ".join(f'"{year}"' for year in years_classified)
+
+        prompt = (
+            f"You are a highly precise e-commerce analysis engine. Below are classified URL lists of the SAME website for several archive years. "
+            f"For EACH year independently, select the most core and important {crawl_num} URLs from that year's list only.\n\n"
+            f"<selection_rules>\n"
+            f"1. Identify and prioritize URLs that are core, important, and valuable to the customer.\n"
+            f"2. Cover ALL six journey stages (Awareness, Interest, Consideration, Decision, Fulfillment, Retention).\n"
+            f"3. Ensure that type_name of the selected URLs are well-diversified and not concentrated.\n"
+            f"4. Please choose English URLs only."
+            f"</selection_rules>\n\n"
+            f"<classified_urls>\n" + "\n".join(year_blocks) + f"\n</classified_urls>\n\n"
+            f"<output_format_instructions>Output ONLY the JSON object starting with '{{' and ending with '}}'. "
+            f"\"per_year\" must contain exactly the keys {year_ids}, using the schema: \n"
+            f"{{\n  \"per_year\": {{\n    \"<year>\": {{\n      \"core_url_recommendations\": {{\n        \"recommended_url_list\": [\n          {{\n            \"url\": \"...\",\n            \"customer_journey_stage\": \"...\",\n            \"type_name\": \"...\",\n            \"selection_reason\": \"...\"\n          }}\n        ],\n        \"total_recommendations\": {crawl_num},\n        \"coverage_scenario_types\": [\"Awareness\", \"Interest\", \"Consideration\", \"Decision\", \"Fulfillment\", \"Retention\"]\n      }}\n    }}\n  }}\n}}\n"
+            f"</output_format_instructions>"
+        )
+        
+        llm_resp = self._call_llm(
+            prompt, model=self.medium_model, task_tag=f"批量选择核心URLs x{len(years_classified)}",
+            max_tokens=4096 * len(years_classified), json_mode=True
+        )
+        parsed = self._parse_llm_response(llm_resp)
+        per_year = parsed.get("per_year", {}) if isinstance(parsed, dict) else {}
+        return {year: data for year, data in per_year.items() if year in years_classified and isinstance(data, dict)}
+    
+    def _collapse_classified_urls(self, classified_urls: List[Dict]) -> List[Dict]:
+        """同一路径模板只保留一个代表URL（附 similar_urls_count），缩小prompt体积"""
+        collapsed: Dict[str, Dict] = {}
+        for item in classified_urls:
+            template = self._canonicalize_path(item['url'])
+            if template in collapsed:
+                collapsed[template]['similar_urls_count'] += 1
+            else:
+                collapsed[template] = {**item, 'similar_urls_count': 1}
+        return list(collapsed.values())
+    
     def _optimize_crawl_strategy(self, llm_analysis: Dict, valid_content_urls: List[str], year: str, *, enforce_in_valid: Optional[bool] = None,) -> Dict:
         """Generate final crawl list.
 
@@ -404,21 +691,25 @@ class LLMPlanner:
 
         enforce = True if enforce_in_valid is None else enforce_in_valid
         
+        # 有效URL集合，用于O(1)成员判断；原列表保留用于有序截取
+        valid_set = frozenset(valid_content_urls)
+        
         if core_url_data and "recommended_url_list" in core_url_data:
             for url_info in core_url_data["recommended_url_list"]:
                 url_str = url_info["url"] if isinstance(url_info, dict) else url_info
                 
                 if enforce:
-                    if url_str in valid_content_urls:
+                    if url_str in valid_set:
                         recommended_urls.append(url_str)
                 else:
                     recommended_urls.append(url_str)
         
-        # 去重保持顺序
-        recommended_urls = list(dict.fromkeys(recommended_urls))
+        # 去重保持顺序（无重复时跳过重建）
+        if len(recommended_urls) != len(set(recommended_urls)):
+            recommended_urls = list(dict.fromkeys(recommended_urls))
         
         # 统计重叠数量
-        overlap_count = sum(1 for u in recommended_urls if u in valid_content_urls)
+        overlap_count = sum(1 for u in recommended_urls if u in valid_set)
         
         # 如果没有推荐URL，使用前10个有效URL
         if not recommended_urls:
@@ -444,62 +735,143 @@ class LLMPlanner:
         
         return analysis_result
     
-    def _call_llm(self, prompt: str, model: Optional[str] = None, *, task_tag: Optional[str] = None) -> str:
-        """调用LLM API"""
+    def _call_llm(self, prompt: str, model: Optional[str] = None, *, task_tag: Optional[str] = None,
+                  max_tokens: int = 30000, json_mode: bool = False) -> str:
+        """调用LLM API（相同请求优先命中缓存）
+
+        Args:
+            max_tokens: 输出token上限，按任务的响应规模设置
+            json_mode: 为True时要求模型直接输出JSON对象（response_format=json_object）
+        """
         try:
             model_to_use = model if model else self.medium_model
+            temperature = 0.2
             
             tag_txt = f" [{task_tag}]" if task_tag else ""
+            
+            # 按请求内容计算缓存键（JSON模式单独计入，非JSON模式的键与之前保持一致）
+            json_tag = "\0json" if json_mode else ""
+            cache_key = hashlib.blake2b(
+                f"{model_to_use}\0{SYSTEM_PROMPT}\0{prompt}\0{temperature}\0{max_tokens}{json_tag}".encode("utf-8"),
+                digest_size=16
+            ).hexdigest()
+            cached = self._read_llm_cache(cache_key) if self.llm_cache_enabled else None
+            if cached is not None:
+                if self._is_valid_llm_response(cached):
+                    self.logger.info(f"♻️ 命中LLM缓存{tag_txt}: {model_to_use}")
+                    return cached
+                # 旧版本可能缓存过无法解析的响应，丢弃后重新请求
+                self.logger.warning(f"⚠️ 缓存的LLM响应无法解析，已丢弃并重新请求{tag_txt}")
+                self._evict_llm_cache(cache_key)
+            
             self.logger.info(f"🤖 调用LLM模型{tag_txt}: {model_to_use}")
             
+            request_kwargs = {}
+            if json_mode:
+                request_kwargs["response_format"] = {"type": "json_object"}
+            
             response = self.client.chat.completions.create(
                 model=model_to_use,
                 messages=[
-                    {"role": "system", "content": "You are a professional e-commerce website analysis expert, skilled in differentiated analysis for different years. Please respond in English and strictly follow the required JSON format."},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=30000
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **request_kwargs
             )
             
             response_content = response.choices[0].message.content
             self.logger.info(f"✅ LLM响应接收成功{tag_txt}")
             
+            # 只缓存能解析出JSON的响应：被截断或格式错误的响应若写入缓存，重跑时会一直得到同样的错误结果
+            if self.llm_cache_enabled and self._is_valid_llm_response(response_content):
+                self._write_llm_cache(cache_key, model_to_use, response_content)
             return response_content
             
         except Exception as e:
             self.logger.error(f"❌ LLM API调用失败: {e}")
             raise e
     
+    def _read_llm_cache(self, cache_key: str) -> Optional[str]:
+        """读取LLM响应缓存（先内存后磁盘），未命中返回None"""
+        if cache_key in self._memory_cache:
+            return self._memory_cache[cache_key]
+        if not self._active_cache_dir:
+            return None
+        
+        cache_file = os.path.join(self._active_cache_dir, f"{cache_key}.json")
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            content = json_io.load_file(cache_file)["content"]
+        except Exception as e:
+            self.logger.warning(f"⚠️ 读取LLM缓存失败 {cache_file}: {e}")
+            return None
+        
+        self._memory_cache[cache_key] = content
+        return content
+    
+    def _evict_llm_cache(self, cache_key: str):
+        """删除LLM响应缓存（内存与磁盘）"""
+        self._memory_cache.pop(cache_key, None)
+        if not self._active_cache_dir:
+            return
+        try:
+            os.remove(os.path.join(self._active_cache_dir, f"{cache_key}.json"))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"⚠️ 删除LLM缓存失败: {e}")
+    
+    def _write_llm_cache(self, cache_key: str, model: str, content: str):
+        """写入LLM响应缓存（json_io 内部以临时文件 + os.replace 原子替换）"""
+        self._memory_cache[cache_key] = content
+        if not self._active_cache_dir or content is None:
+            return
+        
+        try:
+            os.makedirs(self._active_cache_dir, exist_ok=True)
+            cache_file = os.path.join(self._active_cache_dir, f"{cache_key}.json")
+            json_io.dump_file(cache_file, {
+                "model": model,
+                "cache_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "content": content
+            }, indent=False)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入LLM缓存失败: {e}")
+    
+    @staticmethod
+    def _extract_json(response: str):
+        """从LLM响应中解析出JSON值，失败时抛出 json.JSONDecodeError / ValueError"""
+        # JSON模式下响应本身即为JSON对象，直接解析
+        try:
+            return json_io.loads(response)
+        except (json.JSONDecodeError, TypeError):
+            pass
+        
+        # 从首个 { / [（有```json代码块时从代码块内）处解析出一个完整JSON值，容忍其后的说明文字；
+        # 只尝试这一个位置：被截断的响应若改从后面的括号解析，只会得到内部片段
+        if not isinstance(response, str):
+            raise ValueError("响应内容为空")
+        search_from = response.find("```json") + 7 if "```json" in response else 0
+        m = _JSON_START_RE.search(response, search_from)
+        if not m:
+            raise ValueError("响应中未找到JSON")
+        return _JSON_DECODER.raw_decode(response, m.start())[0]
+    
+    def _is_valid_llm_response(self, response: str) -> bool:
+        """响应能否解析出JSON（决定是否写入/复用缓存）"""
+        try:
+            self._extract_json(response)
+            return True
+        except (json.JSONDecodeError, ValueError):
+            return False
+    
     def _parse_llm_response(self, response: str) -> Dict:
         """解析LLM响应"""
         try:
-            # 提取JSON
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            else:
-                # 尝试定位对象或数组
-                obj_start = response.find("{")
-                arr_start = response.find("[")
-
-                if obj_start == -1 and arr_start == -1:
-                    raise ValueError("响应中未找到JSON")
-
-                # 优先处理对象
-                if obj_start != -1 and (arr_start == -1 or obj_start < arr_start):
-                    json_start = obj_start
-                    json_end = response.rfind("}") + 1
-                    json_str = response[json_start:json_end]
-                else:
-                    json_start = arr_start
-                    json_end = response.rfind("]") + 1
-                    json_str = response[json_start:json_end]
-            
-            parsed = json.loads(json_str)
-            return parsed
-            
+            return self._extract_json(response)
         except (json.JSONDecodeError, ValueError) as e:
             self.logger.error(f"❌ LLM响应解析失败: {e}")
             raise Exception(f"LLM响应格式错误，无法解析分析结果: {e}")
@@ -514,8 +886,7 @@ class LLMPlanner:
             return {}
         
         try:
-            with open(planning_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = json_io.load_file(planning_file)
             
             yearly_results = data.get("yearly_analysis_results", {})
             self.logger.info(f"✅ 成功加载 {len(yearly_results)} 年的规划数据")
@@ -526,17 +897,17 @@ class LLMPlanner:
             return {}
 
     # ----------------- 新增工具方法 -----------------
-    def _write_planning_file(self, output_file: str, company_url: str, yearly_analysis: Dict[str, Dict]):
-        """将规划结果写入文件（用于增量保存）"""
+    def _write_planning_file(self, output_file: str, company_url: str, yearly_analysis: Dict[str, Dict], indent: bool = False):
+        """将规划结果写入文件（用于增量保存；增量写入使用紧凑格式，最终写入再缩进美化）"""
         try:
             result_data = {
                 "agent_version": "LLM_Planner_v1.0",
                 "company_url": company_url,
                 "export_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "yearly_analysis_results": yearly_analysis
+                # 并发完成顺序不固定，按年份排序写出
+                "yearly_analysis_results": dict(sorted(yearly_analysis.items()))
             }
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
+            json_io.dump_file(output_file, result_data, indent=indent)
             self.logger.debug(f"💾 已增量写入规划文件: {output_file}（共 {len(yearly_analysis)} 年）")
         except Exception as e:
             self.logger.warning(f"⚠️ 增量写入规划文件失败: {e}")
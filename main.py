@@ -6,10 +6,14 @@
 """
 
 import argparse
+import atexit
 import logging
 import os
+import re
 from datetime import datetime
-from typing import List, Tuple, Set
+from logging.handlers import MemoryHandler
+from operator import itemgetter
+from typing import Dict, List, Tuple
 
 # 导入重构后的模块
 from url_processing import URLProcessor, extract_company_url_from_filepath
@@ -17,38 +21,26 @@ from llm_planning import LLMPlanner
 from scenario_analyzer import ScenarioAnalyzer, verify_scenario_definitions
 
 
+# Wayback 快照URL：/web/<YYYY><MMDDhhmmss>/<原始URL>
+_HIST_RE = re.compile(r"^https://web\.archive\.org/web/(\d{4})\d{10}/")
+
+
 def load_historical_urls_from_file(file_path: str) -> List[Tuple[str, str]]:
     """从文件加载历史URL数据并提取年份、并按年份排序"""
+    historical_urls: List[Tuple[str, str]] = []
     try:
+        # 逐行读取，边解析边按URL保序去重（URL -> 年份）
+        url_years: Dict[str, str] = {}
         with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        import re
-
-        # 收集 (year, url) 列表
-        historical_urls_raw: List[Tuple[str, str]] = []
-
-        for line in lines:
-            line = line.strip()
-            if not line or not line.startswith("https://web.archive.org/"):
-                continue
-            m = re.search(r"/web/(\d{4})\d{10}/", line)
-            if not m:
-                continue
-            year = m.group(1)
-            historical_urls_raw.append((year, line))
+            for line in f:
+                line = line.strip()
+                m = _HIST_RE.match(line)
+                if not m:
+                    continue
+                url_years.setdefault(line, m.group(1))
 
         # 按年份升序排序；稳定排序可保持同年内原始顺序
-        historical_urls_raw.sort(key=lambda x: x[0])
-
-        # 去重保持顺序
-        seen: Set[str] = set()
-        historical_urls = []
-        for year, url in historical_urls_raw:
-            if url in seen:
-                continue
-            seen.add(url)
-            historical_urls.append((year, url))
+        historical_urls = sorted(((year, url) for url, year in url_years.items()), key=itemgetter(0))
 
         logging.info("✅ 成功读取 %d 个历史URLs from %s", len(historical_urls), file_path)
     except FileNotFoundError:
@@ -70,12 +62,19 @@ def setup_logging(company_url: str):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = os.path.join(logs_dir, f"log_main_{timestamp}.txt")
     
+    # 文件日志经 MemoryHandler 批量写入（满1024条或出现ERROR时落盘），退出时刷新剩余记录
+    log_format = "%(asctime)s - %(levelname)s - %(message)s"
+    file_handler = logging.FileHandler(log_filename, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(log_format))
+    memory_handler = MemoryHandler(1024, flushLevel=logging.ERROR, target=file_handler)
+    atexit.register(memory_handler.flush)
+    
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
+        format=log_format,
         handlers=[
             logging.StreamHandler(),
-            logging.FileHandler(log_filename, encoding="utf-8")
+            memory_handler
         ]
     )
     
@@ -88,6 +87,15 @@ def main():
     parser.add_argument("--verify-only", action="store_true", help="仅验证场景定义并退出")
     parser.add_argument("--input", type=str, default="./inputs/apple.com.txt", help="历史URL列表路径")
     parser.add_argument("--api-key", type=str, default="", help="OpenAI API密钥")
+    parser.add_argument("--http-cache", action="store_true",
+                        help="缓存链接发现与页面抓取的HTTP响应到 outputs/.http_cache（需安装requests_cache；URL可用性检查不缓存）")
+    parser.add_argument("--save-pages", action="store_true",
+                        help="将抓取的页面文本按年保存到 outputs/<company>/websites/{year}.jsonl")
+    parser.add_argument("--no-llm-cache", action="store_true", help="不使用LLM响应缓存（每次都重新请求，且不写入缓存）")
+    parser.add_argument("--llm-cache-dir", type=str, default=None,
+                        help="LLM响应缓存目录（默认 outputs/<company>/.llm_cache）")
+    parser.add_argument("--years-per-request", type=int, default=1,
+                        help="每次LLM请求合并规划的年份数（1为逐年请求，最多8）")
     args = parser.parse_args()
 
     # 步骤0: 验证场景定义
@@ -117,7 +125,7 @@ def main():
     try:
         # 步骤2: URL处理
         logging.info("🌐 开始URL处理...")
-        url_processor = URLProcessor()
+        url_processor = URLProcessor(http_cache=args.http_cache)
         links_file = url_processor.process_urls_for_company(historical_urls, company_url)
         year_links_map = url_processor.load_filtered_links(company_url)
         
@@ -129,14 +137,16 @@ def main():
         
         # 步骤3: LLM规划
         logging.info("🧠 开始LLM规划...")
-        llm_planner = LLMPlanner(api_key=args.api_key)
+        llm_planner = LLMPlanner(api_key=args.api_key, cache_dir=args.llm_cache_dir,
+                                 llm_cache=not args.no_llm_cache)
         
         # 生成核心页面类型
         core_types_file = llm_planner.generate_core_page_types(year_links_map, company_url)
         logging.info(f"✅ 核心页面类型已生成: {core_types_file}")
         
         # 生成LLM规划
-        planning_file = llm_planner.generate_llm_planning(year_links_map, company_url)
+        planning_file = llm_planner.generate_llm_planning(year_links_map, company_url,
+                                                           years_per_request=args.years_per_request)
         llm_planning_results = llm_planner.load_llm_planning(company_url)
         
         if not llm_planning_results:
@@ -147,7 +157,7 @@ def main():
         
         # 步骤4: 场景分析
         logging.info("🔍 开始场景分析...")
-        scenario_analyzer = ScenarioAnalyzer()
+        scenario_analyzer = ScenarioAnalyzer(http_cache=args.http_cache, save_content=args.save_pages)
         scenarios_file = scenario_analyzer.analyze_scenarios_for_company(llm_planning_results, company_url)
         
         logging.info(f"✅ 场景分析完成: {scenarios_file}")
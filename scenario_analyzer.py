@@ -5,24 +5,103 @@
 负责分析网页内容并识别用户场景
 """
 
-import json
+import functools
+import hashlib
 import logging
 import os
 import re
-import time
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Set, Tuple, Optional
 from datetime import datetime
 import pathlib
+import json_io
 from url_processing import URLProcessor
 
+try:
+    import hyperscan  # 可选依赖（python-hyperscan），SIMD加速的多关键词扫描，优先于其他匹配方式
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick  # 可选依赖（pyahocorasick），用于关键词多模式匹配
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2  # 可选依赖（google-re2），关键词合并正则以DFA单遍扫描
+except ImportError:
+    re2 = None
+
+try:
+    import stringzilla  # 可选依赖，SIMD加速的子串查找（无自动机时使用）
+except ImportError:
+    stringzilla = None
+
+# 微场景定义文件
+SCENARIOS_FILE = pathlib.Path(__file__).resolve().parent / "inputs" / "1_scenario_mapping" / "micro_scenarios_definitions_v0.3.json"
+
+# 场景ID前缀 -> 所属阶段（如 "3.2_xxx" 属于 Consideration Stage）
+_STAGE_BY_PREFIX = {
+    "1.": "Awareness Stage",
+    "2.": "Interest Stage",
+    "3.": "Consideration Stage",
+    "4.": "Decision Stage",
+    "5.": "Fulfillment Stage",
+    "6.": "Retention Stage",
+}
+
+
+def _ascii_lower(text: str) -> str:
+    """仅对ASCII字母做小写转换（非ASCII字符原样保留）
+
+    str.translate 逐字符查表，在CJK页面上反而比 lower() 更慢；
+    先编码为UTF-8再用 bytes.lower()（只处理ASCII）转换后解码，在非ASCII文本上约快一倍。
+    """
+    if text.isascii():
+        return text.lower()
+    return text.encode("utf-8", "surrogatepass").lower().decode("utf-8", "surrogatepass")
+
+
+@functools.lru_cache(maxsize=512)
+def _load_json_cached(path: str, mtime_ns: int) -> Dict:
+    """按 (路径, 修改时间) 缓存解析后的JSON文件，文件更新后自动重新加载（调用方不应修改返回值）"""
+    return json_io.load_file(path)
+
+
+def _load_definitions(scenarios_file: pathlib.Path) -> Dict:
+    """读取场景定义文件（同一进程内多次调用只解析一次）"""
+    return _load_json_cached(str(scenarios_file), scenarios_file.stat().st_mtime_ns)
+
 
 class ScenarioAnalyzer:
     """场景分析器"""
     
-    def __init__(self):
-        """初始化场景分析器"""
-        self.url_processor = URLProcessor()
+    def __init__(self, http_cache: bool = False, save_content: bool = False):
+        """初始化场景分析器
+
+        Args:
+            http_cache: 抓取页面内容时是否使用本地HTTP响应缓存（见 URLProcessor）
+            save_content: 是否将抓取的页面文本（小写）保存到 outputs/<company>/websites/{year}.jsonl
+        """
+        self.url_processor = URLProcessor(http_cache=http_cache)
         self.logger = logging.getLogger(__name__)
+        self.save_content = save_content
+        
+        # 扁平化的场景关键词：[(场景标识 "ID_名称", (小写关键词, ...)), ...]
+        self._flat_scenarios: List[Tuple[str, Tuple[str, ...]]] = []
+        self._ascii_keywords = False  # 关键词是否全为ASCII（是则页面内容只需做ASCII小写转换）
+        
+        # 页面内容按年追加到 websites/{year}.jsonl，同一年份的所有线程共用一个文件描述符
+        self._content_writers: Dict[str, int] = {}
+        self._content_lock = threading.Lock()
+        
+        # 页面内容摘要缓存：{url: (摘要, 场景列表)}，持久化到 {company}_page_hashes.ndjson
+        self._page_hash_cache: Dict[str, Tuple[str, List[str]]] = {}
+        self._page_hash_file: Optional[str] = None
+        self._page_hash_lock = threading.Lock()
         
         # 场景识别结果存储
         self.yearly_scenario_data = {}
@@ -30,24 +109,116 @@ class ScenarioAnalyzer:
         
         # 微场景定义
         self.micro_scenarios = self._load_scenario_definitions()
+        self._definitions_key = hashlib.blake2b(json_io.dumps(self._flat_scenarios, indent=False), digest_size=16).digest()
+        self._keyword_db, self._keyword_db_labels = self._build_keyword_database()
+        self._keyword_scratch = threading.local()  # hyperscan 的 scratch 不能跨线程共用，每个线程各建一份
+        self._keyword_automaton = self._build_keyword_automaton()
+        self._keyword_regex, self._keyword_hit_labels = self._build_keyword_regex()
         
-        self.logger.info(f"🔍 场景分析器已初始化")
+        self.logger.info("🔍 场景分析器已初始化")
     
     def _load_scenario_definitions(self) -> Dict:
         """加载微场景定义"""
         try:
-            base_dir = pathlib.Path(__file__).resolve().parent
-            scenarios_file = base_dir / "inputs" / "1_scenario_mapping" / "micro_scenarios_definitions_v0.3.json"
-            with open(scenarios_file, 'r', encoding='utf-8') as f:
-                scenarios_data = json.load(f)
+            scenarios_data = _load_definitions(SCENARIOS_FILE)
+            
+            # 场景标识与小写关键词只在加载时构造一次，页面匹配时直接使用
+            self._flat_scenarios = [
+                (sys.intern(f"{scenario_id}_{scenario_info['name']}"), tuple(sys.intern(keyword.lower()) for keyword in scenario_info['keywords']))
+                for stage_scenarios in scenarios_data["scenarios"].values()
+                for scenario_id, scenario_info in stage_scenarios.items()
+            ]
+            self._ascii_keywords = all(keyword.isascii() for _, keywords in self._flat_scenarios for keyword in keywords)
             
-            self.logger.info(f"✅ 成功加载 {scenarios_data.get('total_scenarios', 0)} 个微场景")
+            self.logger.info("✅ 成功加载 %s 个微场景", scenarios_data.get('total_scenarios', 0))
             return scenarios_data["scenarios"]
             
         except Exception as e:
-            self.logger.error(f"❌ 加载场景定义失败: {e}")
+            self.logger.error("❌ 加载场景定义失败: %s", e)
             return {}
     
+    def _keyword_label_map(self) -> Dict[str, List[str]]:
+        """关键词 -> 场景标识列表（同一关键词可能属于多个场景）"""
+        keyword_labels: Dict[str, List[str]] = {}
+        for label, keywords in self._flat_scenarios:
+            for keyword in keywords:
+                keyword_labels.setdefault(keyword, []).append(label)
+        return keyword_labels
+    
+    def _build_keyword_database(self):
+        """将所有场景关键词编译为单个hyperscan块模式数据库；未安装hyperscan时返回 (None, [])
+
+        Returns:
+            (数据库, 按表达式ID排列的场景标识元组列表)
+        """
+        if hyperscan is None or not self._flat_scenarios:
+            return None, []
+        
+        keyword_labels = [(keyword, tuple(labels)) for keyword, labels in self._keyword_label_map().items() if keyword]
+        if not keyword_labels:
+            return None, []
+        # 关键词全为ASCII时按大小写无关编译，页面内容无需先转小写；SINGLEMATCH 使每个关键词最多报告一次
+        flags = hyperscan.HS_FLAG_SINGLEMATCH
+        if self._ascii_keywords:
+            flags |= hyperscan.HS_FLAG_CASELESS
+        
+        database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        database.compile(
+            expressions=[re.escape(keyword).encode("utf-8") for keyword, _ in keyword_labels],
+            ids=list(range(len(keyword_labels))),
+            elements=len(keyword_labels),
+            flags=[flags] * len(keyword_labels),
+        )
+        return database, [labels for _, labels in keyword_labels]
+    
+    def _scan_keyword_database(self, content: str) -> Set[str]:
+        """用hyperscan数据库扫描页面内容，返回命中的场景标识"""
+        scratch = getattr(self._keyword_scratch, "scratch", None)
+        if scratch is None:
+            scratch = hyperscan.Scratch(self._keyword_db)
+            self._keyword_scratch.scratch = scratch
+        
+        haystack = content if self._ascii_keywords else content.lower()
+        matched_ids: Set[int] = set()
+        self._keyword_db.scan(
+            haystack.encode("utf-8", "surrogatepass"),
+            match_event_handler=lambda expression_id, *_: matched_ids.add(expression_id),
+            scratch=scratch,
+        )
+        
+        labels_by_id = self._keyword_db_labels
+        return {label for expression_id in matched_ids for label in labels_by_id[expression_id]}
+    
+    def _build_keyword_automaton(self):
+        """将所有场景关键词构建为Aho-Corasick自动机，未安装pyahocorasick或已使用hyperscan时返回None"""
+        if ahocorasick is None or self._keyword_db is not None or not self._flat_scenarios:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, labels in self._keyword_label_map().items():
+            automaton.add_word(keyword, tuple(labels))
+        automaton.make_automaton()
+        return automaton
+    
+    def _build_keyword_regex(self):
+        """无自动机时，用re2将所有关键词编译为单个交替正则；未安装re2时返回 (None, {})
+
+        Returns:
+            (编译后的正则, {命中的关键词: 由此可判定命中的场景标识集合})
+        """
+        if re2 is None or self._keyword_db is not None or self._keyword_automaton is not None or not self._flat_scenarios:
+            return None, {}
+        
+        keyword_labels = {keyword: labels for keyword, labels in self._keyword_label_map().items() if keyword}
+        
+        # 交替正则在同一位置只报告一个（最长的）关键词，命中某关键词即意味着它包含的所有关键词也命中
+        hit_labels = {
+            keyword: frozenset(label for other, labels in keyword_labels.items() if other in keyword for label in labels)
+            for keyword in keyword_labels
+        }
+        pattern = "|".join(re.escape(keyword) for keyword in sorted(keyword_labels, key=len, reverse=True))
+        return re2.compile(pattern), hit_labels
+    
     def analyze_scenarios_for_company(self, llm_planning_results: Dict[str, Dict], company_url: str) -> str:
         """
         基于LLM规划结果分析场景并保存
@@ -59,7 +230,7 @@ class ScenarioAnalyzer:
         Returns:
             输出文件路径
         """
-        self.logger.info(f"🔍 开始分析场景: {company_url}")
+        self.logger.info("🔍 开始分析场景: %s", company_url)
         
         # 准备输出目录
         output_dir = os.path.join("outputs", company_url)
@@ -67,19 +238,30 @@ class ScenarioAnalyzer:
         websites_dir = os.path.join(output_dir, "websites")
         os.makedirs(websites_dir, exist_ok=True)
         
-        # 输出文件路径
+        # 输出文件路径（逐年结果先追加到NDJSON检查点，全部完成后再汇总写出JSON）
         output_file = os.path.join(output_dir, f"{company_url}_scenarios.json")
+        checkpoint_file = os.path.join(output_dir, f"{company_url}_scenarios.ndjson")
+        
+        # 上次运行记录的页面摘要：内容未变化的页面直接复用识别结果
+        self._page_hash_file = os.path.join(output_dir, f"{company_url}_page_hashes.ndjson")
+        self._page_hash_cache = self._load_page_hashes(self._page_hash_file)
         
         # 检查是否已存在结果
         existing_results = {}
-        if os.path.exists(output_file):
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                existing_results = data.get("yearly_detailed_results", {})
-                self.logger.info(f"✅ 加载已存在的场景结果: {len(existing_results)} 年")
-            except Exception as e:
-                self.logger.warning(f"⚠️ 加载已存在场景结果失败: {e}")
+        try:
+            data = json_io.load_file(output_file)
+            existing_results = data.get("yearly_detailed_results", {})
+            self.logger.info("✅ 加载已存在的场景结果: %s 年", len(existing_results))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning("⚠️ 加载已存在场景结果失败: %s", e)
+        
+        # 上次中断时未汇总的年份结果
+        checkpoint_results = self._load_year_checkpoints(checkpoint_file)
+        if checkpoint_results:
+            existing_results.update(checkpoint_results)
+            self.logger.info("✅ 从检查点恢复场景结果: %s 年", len(checkpoint_results))
         
         # 按年分析场景
         self.yearly_scenario_data = existing_results.copy()
@@ -87,15 +269,15 @@ class ScenarioAnalyzer:
         for year, planning_data in llm_planning_results.items():
             # 断点续跑
             if year in self.yearly_scenario_data:
-                self.logger.info(f"⏩ {year} 年场景已存在，跳过")
+                self.logger.info("⏩ %s 年场景已存在，跳过", year)
                 continue
             
-            self.logger.info(f"🔍 分析 {year} 年的场景...")
+            self.logger.info("🔍 分析 %s 年的场景...", year)
             
             try:
                 crawl_urls = planning_data.get("recommended_crawl_pages", [])
                 if not crawl_urls:
-                    self.logger.warning(f"❌ {year} 年没有推荐URL，跳过")
+                    self.logger.warning("❌ %s 年没有推荐URL，跳过", year)
                     continue
                 
                 year_scenarios, successful_pages = self._analyze_scenarios_for_year(year, crawl_urls, websites_dir)
@@ -109,45 +291,102 @@ class ScenarioAnalyzer:
                     "stage_distribution": self._categorize_scenarios_by_stage(year_scenarios),
                 }
                 
-                self.logger.info(f"✅ {year} 年场景分析完成: {len(year_scenarios)} 个场景")
-                
-                # 增量保存
-                self._generate_analysis_summary(company_url)
+                self.logger.info("✅ %s 年场景分析完成: %s 个场景", year, len(year_scenarios))
                 
             except Exception as e:
-                self.logger.error(f"❌ {year} 年场景分析失败: {e}")
+                self.logger.error("❌ %s 年场景分析失败: %s", year, e)
                 self.yearly_scenario_data[year] = {
                     "identified_scenarios": [],
                     "total_scenario_count": 0,
                     "error": str(e)
                 }
+            
+            # 增量保存：只追加本年记录
+            self._append_year_checkpoint(checkpoint_file, year, self.yearly_scenario_data[year])
         
-        # 生成并保存分析摘要
+        # 生成并保存分析摘要，汇总完成后检查点不再需要
         output_file = self._generate_analysis_summary(company_url)
+        if output_file:
+            try:
+                os.remove(checkpoint_file)
+            except FileNotFoundError:
+                pass
         
         return output_file
     
-    def _analyze_scenarios_for_year(self, year: str, crawl_urls: List[str], websites_dir: str) -> Set[str]:
-        """分析单年的场景"""
+    def _append_year_checkpoint(self, checkpoint_file: str, year: str, year_data: Dict):
+        """将单年场景结果追加为NDJSON检查点中的一行"""
+        try:
+            with open(checkpoint_file, 'ab') as f:
+                f.write(json_io.dumps({"year": year, "data": year_data}, indent=False) + b"\n")
+        except Exception as e:
+            self.logger.warning("⚠️ 写入场景检查点失败: %s", e)
+    
+    def _load_year_checkpoints(self, checkpoint_file: str) -> Dict[str, Dict]:
+        """读取NDJSON检查点，返回 {year: year_data}；中断时写了一半的行直接跳过"""
+        results: Dict[str, Dict] = {}
+        try:
+            with open(checkpoint_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json_io.loads(line)
+                        results[record["year"]] = record["data"]
+                    except Exception:
+                        continue
+        except FileNotFoundError:
+            pass
+        return results
+    
+    def _analyze_scenarios_for_year(self, year: str, crawl_urls: List[str], websites_dir: str, max_workers: int = 8) -> Set[str]:
+        """分析单年的场景（多线程抓取页面，按站点限速；max_workers <= 1 时按顺序逐页分析）"""
         year_scenarios: Set[str] = set()
         successful_pages = 0
         
-        for i, url in enumerate(crawl_urls):
-            self.logger.info(f"📄 [{year}] 分析页面 {i + 1}/{len(crawl_urls)}")
-            try:
-                page_scenarios = self._identify_scenarios_in_page(url, year, websites_dir)
-                if page_scenarios:
-                    year_scenarios.update(page_scenarios)
-                successful_pages += 1
-            except Exception as e:
-                self.logger.warning(f"❌ 页面分析失败 {url}: {e}")
+        def analyze_page(index: int, url: str, known_scenarios: Optional[Set[str]] = None) -> Set[str]:
+            # 同一站点的请求间隔与并发数由 url_processor 在抓取时控制
+            self.logger.info("📄 [%s] 分析页面 %d/%d", year, index + 1, len(crawl_urls))
+            return self._identify_scenarios_in_page(
+                url, year, websites_dir, known_scenarios=known_scenarios, page_index=index
+            )
+        
+        try:
+            if max_workers <= 1:
+                # 顺序执行时跳过前面页面已识别的场景，每页扫描哪些关键词只取决于页面顺序
+                for i, url in enumerate(crawl_urls):
+                    try:
+                        year_scenarios.update(analyze_page(i, url, known_scenarios=year_scenarios))
+                        successful_pages += 1
+                    except Exception as e:
+                        self.logger.warning("❌ 页面分析失败 %s: %s", url, e)
+                return year_scenarios, successful_pages
             
-            time.sleep(1)  # 避免请求过于频繁
+            # 并发时不传入已知场景：各线程看到的已知场景取决于执行时机，结果（及页面摘要缓存）将无法复现
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_url = {executor.submit(analyze_page, i, url): url for i, url in enumerate(crawl_urls)}
+                
+                # 结果在主线程合并
+                for future in as_completed(future_to_url):
+                    url = future_to_url[future]
+                    try:
+                        page_scenarios = future.result()
+                        if page_scenarios:
+                            year_scenarios.update(page_scenarios)
+                        successful_pages += 1
+                    except Exception as e:
+                        self.logger.warning("❌ 页面分析失败 %s: %s", url, e)
+        finally:
+            self._close_content_writers()
         
         return year_scenarios, successful_pages
     
-    def _identify_scenarios_in_page(self, url: str, year: str, websites_dir: str) -> Set[str]:
-        """识别单个页面中的微场景"""
+    def _identify_scenarios_in_page(self, url: str, year: str, websites_dir: str,
+                                    known_scenarios: Optional[Set[str]] = None, page_index: int = 0) -> Set[str]:
+        """识别单个页面中的微场景（页面内容与上次运行相同时直接复用上次的识别结果）
+
+        Args:
+            known_scenarios: 本年度已识别的场景，逐场景匹配时跳过，不再扫描其关键词
+            page_index: 页面在本年度推荐列表中的序号（随内容一并保存）
+        """
         scenarios = set()
         
         try:
@@ -156,79 +395,144 @@ class ScenarioAnalyzer:
             if not content:
                 return scenarios
             
-            content_lower = content.lower()
-            
-            # # 保存内容到txt文件
-            # self._save_content_to_txt(url, content_lower, year, websites_dir)
+            # 保存内容（按年追加到JSONL文件）
+            if self.save_content:
+                self._save_content_to_txt(url, content.lower(), year, websites_dir, page_index=page_index)
             
-            # 遍历所有微场景定义进行匹配
-            for stage, stage_scenarios in self.micro_scenarios.items():
-                for scenario_id, scenario_info in stage_scenarios.items():
-                    scenario_name = scenario_info['name']
-                    keywords = scenario_info['keywords']
-                    
-                    # 检查是否有关键词匹配
-                    for keyword in keywords:
-                        if keyword.lower() in content_lower:
-                            scenarios.add(f"{scenario_id}_{scenario_name}")
-                            break  # 找到匹配，移动到下一个场景
+            page_hash = self._page_content_hash(content)
+            cached = self._page_hash_cache.get(url)
+            if cached is not None and cached[0] == page_hash:
+                return set(cached[1])
             
+            scenarios, complete = self._match_page_content(content, known_scenarios)
+            # 跳过了已知场景的结果不完整，不能供下次运行复用
+            if complete:
+                self._record_page_hash(url, page_hash, scenarios)
             return scenarios
             
         except Exception as e:
-            self.logger.warning(f"❌ 场景识别失败 {url}: {e}")
+            self.logger.warning("❌ 场景识别失败 %s: %s", url, e)
             return scenarios
     
-    def _save_content_to_txt(self, url: str, content_lower: str, year: str, websites_dir: str):
-        """保存内容到txt文件"""
+    def _match_page_content(self, content: str, known_scenarios: Optional[Set[str]]) -> Tuple[Set[str], bool]:
+        """在页面内容中匹配场景关键词，返回 (命中的场景标识, 是否为完整结果)"""
+        scenarios = set()
+        
+        # hyperscan 一次扫描找出所有命中的关键词（ASCII关键词大小写无关匹配，省去整页小写转换）
+        if self._keyword_db is not None:
+            return self._scan_keyword_database(content), True
+        
+        content_lower = _ascii_lower(content) if self._ascii_keywords else content.lower()
+        
+        # 自动机一次扫描页面内容即可找出所有命中的关键词
+        if self._keyword_automaton is not None:
+            for _, labels in self._keyword_automaton.iter(content_lower):
+                scenarios.update(labels)
+            return scenarios, True
+        
+        # 合并正则：每次命中后从下一位置继续查找，保证相互重叠的关键词也能被发现
+        if self._keyword_regex is not None:
+            search = self._keyword_regex.search
+            hit_labels = self._keyword_hit_labels
+            m = search(content_lower)
+            while m:
+                scenarios.update(hit_labels[m.group()])
+                m = search(content_lower, m.start() + 1)
+            return scenarios, True
+        
+        # 既无pyahocorasick也无re2时，逐个场景检查是否有关键词匹配（any 命中即停）
+        if stringzilla is not None:
+            haystack_find = stringzilla.Str(content_lower).find
+            contains = lambda keyword: haystack_find(keyword) != -1
+        else:
+            contains = content_lower.__contains__
+        
+        known = known_scenarios or frozenset()
+        for label, keywords in self._flat_scenarios:
+            if label in known:
+                continue
+            if any(map(contains, keywords)):
+                scenarios.add(label)
+        
+        return scenarios, not known
+    
+    def _page_content_hash(self, content: str) -> str:
+        """页面内容摘要（以场景定义摘要为密钥，场景定义变化后旧摘要自然失效）"""
+        return hashlib.blake2b(
+            content.encode("utf-8", "surrogatepass"), digest_size=16, key=self._definitions_key
+        ).hexdigest()
+    
+    def _record_page_hash(self, url: str, page_hash: str, scenarios: Set[str]):
+        """记录页面摘要与识别结果（内存 + 追加到NDJSON文件，供下次运行复用）"""
+        scenario_list = sorted(scenarios)
+        with self._page_hash_lock:
+            self._page_hash_cache[url] = (page_hash, scenario_list)
+            if not self._page_hash_file:
+                return
+            try:
+                with open(self._page_hash_file, 'ab') as f:
+                    f.write(json_io.dumps({"url": url, "hash": page_hash, "scenarios": scenario_list}, indent=False) + b"\n")
+            except Exception as e:
+                self.logger.warning("⚠️ 写入页面摘要失败: %s", e)
+    
+    def _load_page_hashes(self, page_hash_file: str) -> Dict[str, Tuple[str, List[str]]]:
+        """读取页面摘要文件，返回 {url: (摘要, 场景列表)}；同一URL以最后一条记录为准"""
+        page_hashes: Dict[str, Tuple[str, List[str]]] = {}
         try:
-            # 生成时间戳
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # 创建文件名
-            filename = f"{year}_{timestamp}.txt"
-            
-            # 完整文件路径
-            file_path = os.path.join(websites_dir, filename)
-            
-            # 写入内容到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(f"来源URL: {url}\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(content_lower)
+            with open(page_hash_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json_io.loads(line)
+                        page_hashes[record["url"]] = (record["hash"], record["scenarios"])
+                    except Exception:
+                        continue
+        except FileNotFoundError:
+            pass
+        return page_hashes
+    
+    def _save_content_to_txt(self, url: str, content_lower: str, year: str, websites_dir: str, page_index: int = 0):
+        """保存内容：以一行JSON追加到本年度的 websites/{year}.jsonl（不再每页单独建文件）"""
+        try:
+            record = json_io.dumps({"url": url, "index": page_index, "content": content_lower}, indent=False) + b"\n"
+            with self._content_lock:
+                fd = self._content_writer(websites_dir, year)
+                self._write_all(fd, record)
             
-            self.logger.info(f"💾 内容已保存到: {file_path}")
+            self.logger.info("💾 内容已保存: %s", url)
             
         except Exception as e:
-            self.logger.warning(f"❌ 保存内容失败 {url}: {e}")
+            self.logger.warning("❌ 保存内容失败 %s: %s", url, e)
+    
+    def _content_writer(self, websites_dir: str, year: str) -> int:
+        """获取本年度内容文件的描述符，首次使用时以追加模式打开（调用方需持有 _content_lock）"""
+        file_path = os.path.join(websites_dir, f"{year}.jsonl")
+        fd = self._content_writers.get(file_path)
+        if fd is None:
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._content_writers[file_path] = fd
+        return fd
+    
+    def _close_content_writers(self):
+        """关闭所有已打开的内容文件"""
+        with self._content_lock:
+            for fd in self._content_writers.values():
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._content_writers.clear()
+    
+    @staticmethod
+    def _write_all(fd: int, data: bytes):
+        """将字节串完整写入文件描述符（处理部分写入）"""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
     
     def _categorize_scenarios_by_stage(self, scenarios: Set[str]) -> Dict[str, int]:
         """按阶段分类场景"""
-        stage_count = {
-            "Awareness Stage": 0,
-            "Interest Stage": 0, 
-            "Consideration Stage": 0,
-            "Decision Stage": 0,
-            "Fulfillment Stage": 0,
-            "Retention Stage": 0
-        }
-        
-        for scenario in scenarios:
-            scenario_id = scenario.split('_')[0]
-            if scenario_id.startswith('1.'):
-                stage_count["Awareness Stage"] += 1
-            elif scenario_id.startswith('2.'):
-                stage_count["Interest Stage"] += 1
-            elif scenario_id.startswith('3.'):
-                stage_count["Consideration Stage"] += 1
-            elif scenario_id.startswith('4.'):
-                stage_count["Decision Stage"] += 1
-            elif scenario_id.startswith('5.'):
-                stage_count["Fulfillment Stage"] += 1
-            elif scenario_id.startswith('6.'):
-                stage_count["Retention Stage"] += 1
-                
-        return stage_count 
+        counts = Counter(_STAGE_BY_PREFIX.get(scenario[:2]) for scenario in scenarios)
+        return {stage: counts[stage] for stage in _STAGE_BY_PREFIX.values()}
     
     def _generate_analysis_summary(self, company_url: str = None) -> str:
         """生成分析摘要"""
@@ -261,11 +565,10 @@ class ScenarioAnalyzer:
             os.makedirs("outputs", exist_ok=True)
             output_file = os.path.join("outputs", "scenario_analysis_summary.json")
         
-        # 导出分析摘要
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.analysis_summary, f, ensure_ascii=False, indent=2)
+        # 导出分析摘要（原子替换，避免中断时留下不完整的文件）
+        json_io.dump_file(output_file, self.analysis_summary)
         
-        self.logger.info(f"✅ 场景分析结果已导出到: {output_file}")
+        self.logger.info("✅ 场景分析结果已导出到: %s", output_file)
         return output_file
     
     def load_scenarios(self, company_url: str) -> Dict[str, Dict]:
@@ -273,20 +576,22 @@ class ScenarioAnalyzer:
         output_dir = os.path.join("outputs", company_url)
         scenarios_file = os.path.join(output_dir, f"{company_url}_scenarios.json")
         
-        if not os.path.exists(scenarios_file):
-            self.logger.error(f"❌ 场景文件不存在: {scenarios_file}")
+        # 单次 stat 同时判断文件是否存在并取得缓存所需的修改时间
+        try:
+            mtime_ns = os.stat(scenarios_file).st_mtime_ns
+        except FileNotFoundError:
+            self.logger.error("❌ 场景文件不存在: %s", scenarios_file)
             return {}
         
         try:
-            with open(scenarios_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = _load_json_cached(scenarios_file, mtime_ns)
             
             yearly_results = data.get("yearly_detailed_results", {})
-            self.logger.info(f"✅ 成功加载 {len(yearly_results)} 年的场景数据")
+            self.logger.info("✅ 成功加载 %s 年的场景数据", len(yearly_results))
             return yearly_results
             
         except Exception as e:
-            self.logger.error(f"❌ 加载场景文件失败: {e}")
+            self.logger.error("❌ 加载场景文件失败: %s", e)
             return {}
 
 
@@ -295,10 +600,8 @@ def verify_scenario_definitions():
     print("🔍 验证微场景定义完整性...")
     
     try:
-        base_dir = pathlib.Path(__file__).resolve().parent
-        scenarios_file = base_dir / "inputs" / "1_scenario_mapping" / "micro_scenarios_definitions_v0.3.json"
-        with open(scenarios_file, 'r', encoding='utf-8') as f:
-            scenarios_data = json.load(f)
+        scenarios_file = SCENARIOS_FILE
+        scenarios_data = _load_definitions(scenarios_file)
         
         scenarios = scenarios_data["scenarios"]
         total_count = 0
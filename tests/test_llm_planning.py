@@ -0,0 +1,214 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import json_io
+from llm_planning import LLMPlanner
+
+
+class _FakeCompletions:
+    """按顺序返回预设响应内容的 chat.completions 替身"""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        content = self.contents[self.calls]
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _planner(tmp_path, contents, **kwargs):
+    planner = LLMPlanner(api_key="test", cache_dir=str(tmp_path / "llm_cache"), **kwargs)
+    completions = _FakeCompletions(contents)
+    planner.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return planner, completions
+
+
+def test_unparseable_response_is_not_cached(tmp_path):
+    planner, completions = _planner(tmp_path, ['{"truncated": ', '{"ok": 1}'])
+
+    with pytest.raises(Exception):
+        planner._parse_llm_response(planner._call_llm("prompt"))
+
+    # 新的规划器实例（模拟重跑）不应命中上次的坏响应
+    rerun, _ = _planner(tmp_path, [])
+    rerun.client = planner.client
+    assert rerun._parse_llm_response(rerun._call_llm("prompt")) == {"ok": 1}
+    assert completions.calls == 2
+
+
+def test_valid_response_is_served_from_cache(tmp_path):
+    planner, completions = _planner(tmp_path, ['{"ok": 1}'])
+    planner._call_llm("prompt")
+
+    rerun, rerun_completions = _planner(tmp_path, [])
+    assert rerun._parse_llm_response(rerun._call_llm("prompt")) == {"ok": 1}
+    assert rerun_completions.calls == 0
+
+
+def test_bad_cached_response_is_evicted(tmp_path):
+    planner, _ = _planner(tmp_path, ['{"ok": 1}'])
+    planner._call_llm("prompt")
+    # 模拟旧版本遗留的无法解析的缓存条目
+    (cache_file,) = (tmp_path / "llm_cache").glob("*.json")
+    cache_file.write_text('{"model": "m", "content": "not json"}', encoding="utf-8")
+
+    rerun, completions = _planner(tmp_path, ['{"ok": 2}'])
+    assert rerun._parse_llm_response(rerun._call_llm("prompt")) == {"ok": 2}
+    assert completions.calls == 1
+
+
+def test_disabled_cache_always_requests(tmp_path):
+    planner, completions = _planner(tmp_path, ['{"ok": 1}', '{"ok": 2}'], llm_cache=False)
+
+    assert planner._parse_llm_response(planner._call_llm("prompt")) == {"ok": 1}
+    assert planner._parse_llm_response(planner._call_llm("prompt")) == {"ok": 2}
+    assert completions.calls == 2
+    assert not (tmp_path / "llm_cache").exists()
+
+
+def _classify_linear(planner, real_part):
+    """参照实现：按编译后的优先级顺序逐个模式检查，返回首个命中模式的 (阶段, 类型)"""
+    lowered = real_part.lower()
+    for stage, type_name, prefix, regex, _ in planner._compiled_patterns:
+        if prefix is not None:
+            if lowered.startswith(prefix):
+                return stage, type_name
+        elif regex.match(real_part):
+            return stage, type_name
+    return None
+
+
+def _classified_types(planner, paths):
+    urls = [f"https://example.com{path}" for path in paths]
+    classified = {item["url"]: (item["customer_journey_stage"], item["type_name"])
+                  for item in planner._classify_candidate_urls("2020", urls)}
+    return [classified.get(url) for url in urls]
+
+
+def _planner_with_types(tmp_path, nested):
+    planner, _ = _planner(tmp_path, [])
+    planner.core_page_types_nested = nested
+    planner._compile_core_type_patterns()
+    return planner
+
+
+def test_prefix_tie_keeps_pattern_priority(tmp_path):
+    # "/ab*" 与 "/abc" 长度相同，列表中靠前的 "/ab*" 优先级更高，尽管 "/abc" 是更长的命中前缀
+    planner = _planner_with_types(tmp_path, {
+        "Interest Stage": [{"type_name": "AB", "typical_url_patterns": ["/ab*"]}],
+        "Decision Stage": [{"type_name": "ABC", "typical_url_patterns": ["/abc"]}],
+    })
+    assert _classified_types(planner, ["/abcd", "/abx", "/a"]) == [
+        ("Interest Stage", "AB"), ("Interest Stage", "AB"), None,
+    ]
+
+
+def test_classification_matches_linear_scan(tmp_path):
+    import random
+
+    rng = random.Random(0)
+    alphabet = "ab/"
+    for _ in range(50):
+        nested = {"Stage": []}
+        for t in range(6):
+            patterns = []
+            for _ in range(rng.randint(1, 3)):
+                body = "/" + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+                kind = rng.random()
+                if kind < 0.4:
+                    body += "*"
+                elif kind < 0.6 and len(body) > 1:
+                    body = body[:2] + "*" + body[2:]
+                patterns.append(body)
+            nested["Stage"].append({"type_name": f"T{t}", "typical_url_patterns": patterns})
+        planner = _planner_with_types(tmp_path, nested)
+
+        paths = ["/" + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(30)]
+        assert _classified_types(planner, paths) == [_classify_linear(planner, path) for path in paths]
+
+
+def _recommend(url):
+    return {"core_url_recommendations": {"recommended_url_list": [{"url": url}], "total_recommendations": 1}}
+
+
+def test_multi_year_response_is_split_per_year(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batched = json.dumps({"per_year": {"2020": _recommend("https://example.com/p2020b"),
+                                       "2021": _recommend("https://example.com/p2021a")}})
+    planner, completions = _planner(tmp_path, [batched, json.dumps(_recommend("https://example.com/p2022b"))])
+    planner.core_page_types = ["Pages"]
+    planner.core_page_types_nested = {"Stage": [{"type_name": "Pages", "typical_url_patterns": ["/p*"]}]}
+
+    year_links_map = {year: [f"https://example.com/p{year}a", f"https://example.com/p{year}b"]
+                      for year in ("2020", "2021", "2022")}
+    planning_file = planner.generate_llm_planning(year_links_map, "example.com", crawl_num=1,
+                                                  max_workers=1, years_per_request=2)
+
+    # 2020、2021 合并为一次请求，2022 单独请求
+    assert completions.calls == 2
+    results = json_io.load_file(planning_file)["yearly_analysis_results"]
+    assert {year: data["recommended_crawl_pages"] for year, data in results.items()} == {
+        "2020": ["https://example.com/p2020b"],
+        "2021": ["https://example.com/p2021a"],
+        "2022": ["https://example.com/p2022b"],
+    }
+
+
+def test_year_missing_from_batch_falls_back_to_single_request(tmp_path):
+    batched = json.dumps({"per_year": {"2020": _recommend("https://example.com/p2020a")}})
+    planner, completions = _planner(tmp_path, [batched, json.dumps(_recommend("https://example.com/p2021b"))])
+    planner.core_page_types_nested = {"Stage": [{"type_name": "Pages", "typical_url_patterns": ["/p*"]}]}
+    planner._compile_core_type_patterns()
+
+    batch = [(year, [f"https://example.com/p{year}a", f"https://example.com/p{year}b"]) for year in ("2020", "2021")]
+    results = planner._plan_year_batch(batch, crawl_num=1)
+
+    assert completions.calls == 2
+    assert results["2020"]["recommended_crawl_pages"] == ["https://example.com/p2020a"]
+    assert results["2021"]["recommended_crawl_pages"] == ["https://example.com/p2021b"]
+
+
+def test_unwrap_wayback_matches_urlparse():
+    import urllib.parse
+
+    from llm_planning import _unwrap_wayback
+
+    urls = [
+        "https://example.com/a;x/b;y?q=1",
+        "https://example.com/a/b;y",
+        "https://example.com/a;x/b",
+        "https://example.com/;p",
+        "https://example.com/a?",
+        "https://example.com",
+        "http://web.archive.org/web/20200101000000/https://www.example.com/a;x/b;y?q=1",
+    ]
+    for url in urls:
+        real = url.split("/web/20200101000000/", 1)[-1]
+        parsed = urllib.parse.urlparse(real)
+        expected = (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+        assert _unwrap_wayback(url)[1] == expected, url
+
+
+def test_unchanged_planning_file_is_not_rewritten(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nested = {"Stage": [{"type_name": "Pages", "typical_url_patterns": ["/p*"]}]}
+    year_links_map = {"2020": ["https://example.com/p2020a"]}
+
+    def run(links):
+        planner, _ = _planner(tmp_path, [])
+        planner.core_page_types = ["Pages"]
+        planner.core_page_types_nested = nested
+        writes = []
+        original = LLMPlanner._write_planning_file.__get__(planner)
+        planner._write_planning_file = lambda *args, **kwargs: (writes.append(sorted(args[2])), original(*args, **kwargs))
+        planner.generate_llm_planning(links, "example.com", crawl_num=1)
+        return writes
+
+    assert run(year_links_map) == [["2020"]]
+    # 新的规划器实例（模拟重跑）：所有年份均已存在，不再重写
+    assert run(year_links_map) == []
+    assert run({**year_links_map, "2021": ["https://example.com/p2021a"]}) == [["2020", "2021"]]
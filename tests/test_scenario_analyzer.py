@@ -0,0 +1,69 @@
+import json_io
+from scenario_analyzer import ScenarioAnalyzer
+
+
+def _analyzer(pages, **kwargs):
+    analyzer = ScenarioAnalyzer(**kwargs)
+    analyzer.url_processor.get_page_content = lambda url, max_length=None: pages.get(url)
+    return analyzer
+
+
+def test_saved_page_content_is_appended_per_year(tmp_path):
+    pages = {"https://example.com/a": "Hello World", "https://example.com/b": "Second Page"}
+    analyzer = _analyzer(pages, save_content=True)
+
+    analyzer._analyze_scenarios_for_year("2020", list(pages) + ["https://example.com/missing"], str(tmp_path))
+
+    lines = (tmp_path / "2020.jsonl").read_bytes().splitlines()
+    records = sorted((json_io.loads(line) for line in lines), key=lambda r: r["index"])
+    assert records == [
+        {"url": "https://example.com/a", "index": 0, "content": "hello world"},
+        {"url": "https://example.com/b", "index": 1, "content": "second page"},
+    ]
+    assert analyzer._content_writers == {}
+
+
+def test_page_content_is_not_saved_by_default(tmp_path):
+    analyzer = _analyzer({"https://example.com/a": "Hello World"})
+
+    analyzer._analyze_scenarios_for_year("2020", ["https://example.com/a"], str(tmp_path))
+
+    assert not (tmp_path / "2020.jsonl").exists()
+
+
+def _record_known_scenarios(analyzer):
+    """记录每次匹配时传入的已知场景（按页面内容区分）"""
+    seen = {}
+    match = analyzer._match_page_content
+
+    def spy(content, known_scenarios):
+        seen[content] = None if known_scenarios is None else set(known_scenarios)
+        return match(content, known_scenarios)
+
+    analyzer._match_page_content = spy
+    return seen
+
+
+def test_threaded_year_does_not_skip_known_scenarios(tmp_path):
+    label, keywords = ScenarioAnalyzer()._flat_scenarios[0]
+    pages = {f"https://example.com/{i}": f"page {i} {keywords[0]}" for i in range(6)}
+    analyzer = _analyzer(pages)
+    seen = _record_known_scenarios(analyzer)
+
+    year_scenarios, successful = analyzer._analyze_scenarios_for_year("2020", list(pages), str(tmp_path))
+
+    assert label in year_scenarios and successful == 6
+    assert set(seen.values()) == {None}
+
+
+def test_sequential_year_skips_scenarios_found_on_earlier_pages(tmp_path):
+    label, keywords = ScenarioAnalyzer()._flat_scenarios[0]
+    pages = {"https://example.com/a": f"first {keywords[0]}", "https://example.com/b": f"second {keywords[0]}"}
+    analyzer = _analyzer(pages)
+    seen = _record_known_scenarios(analyzer)
+
+    year_scenarios, _ = analyzer._analyze_scenarios_for_year("2020", list(pages), str(tmp_path), max_workers=1)
+
+    assert label in year_scenarios
+    assert seen[pages["https://example.com/a"]] == set()
+    assert label in seen[pages["https://example.com/b"]]
@@ -0,0 +1,48 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from url_processing import URLProcessor
+
+
+def _run_in_slots(processor, urls, hold=0.05):
+    """并发占用站点名额，返回每个站点同时进行中的最大请求数"""
+    lock = threading.Lock()
+    inflight = {}
+    peak = {}
+
+    def fetch(url):
+        host = url.split("/")[2]
+        with processor._host_slot(url):
+            with lock:
+                inflight[host] = inflight.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), inflight[host])
+            time.sleep(hold)
+            with lock:
+                inflight[host] -= 1
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        list(executor.map(fetch, urls))
+    return peak
+
+
+def test_host_slot_bounds_concurrency_per_host():
+    processor = URLProcessor()
+    processor.min_request_interval = 0.0
+    processor.max_inflight_per_host = 2
+
+    urls = [f"https://web.archive.org/web/20{i:02d}0101/https://example.com/" for i in range(8)]
+    urls += [f"https://other.example/{i}" for i in range(2)]
+    peak = _run_in_slots(processor, urls)
+
+    assert peak["web.archive.org"] == 2
+    assert peak["other.example"] == 2
+
+
+def test_host_slot_spaces_requests_to_same_host():
+    processor = URLProcessor()
+    processor.min_request_interval = 0.05
+
+    started = time.monotonic()
+    _run_in_slots(processor, ["https://web.archive.org/a"] * 4, hold=0.0)
+    assert time.monotonic() - started >= 0.15
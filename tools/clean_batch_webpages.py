@@ -13,9 +13,10 @@
 
 import argparse
 import logging
-import shutil
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 # --------------------------- 日志配置 --------------------------- #
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
@@ -40,36 +41,78 @@ def find_target_folders(outputs_dir: Path, keywords: List[str]) -> List[Path]:
         logger.error("指定的 outputs 目录不存在: %s", outputs_dir)
         return targets
 
-    for url_dir in outputs_dir.iterdir():
-        if not url_dir.is_dir():
-            continue  # 跳过文件
+    # os.scandir 的 DirEntry 自带文件类型信息，无需逐个 stat
+    with os.scandir(outputs_dir) as url_entries:
+        for url_entry in url_entries:
+            if not url_entry.is_dir(follow_symlinks=False):
+                continue  # 跳过文件
 
-        for keyword in keywords:
-            candidate = url_dir / keyword
-            if candidate.exists() and candidate.is_dir():
-                targets.append(candidate)
-                logger.debug("发现目标文件夹: %s", candidate)
+            # 不跟随符号链接，避免删除链接指向的目录内容
+            with os.scandir(url_entry.path) as entries:
+                subdirs = {entry.name for entry in entries if entry.is_dir(follow_symlinks=False)}
+
+            for keyword in keywords:
+                if keyword in subdirs:
+                    candidate = Path(url_entry.path) / keyword
+                    targets.append(candidate)
+                    logger.debug("发现目标文件夹: %s", candidate)
 
     return targets
 
 
-def remove_folders(folders: List[Path], dry_run: bool = False):
+def collect_tree(folder: Path) -> Tuple[List[str], List[str]]:
+    """用 os.scandir 遍历目录树，收集其中的文件与子目录。
+
+    Args:
+        folder (Path): 根目录路径。
+
+    Returns:
+        Tuple[List[str], List[str]]: (文件路径列表, 目录路径列表)；目录按先序排列，根目录在最前。
+    """
+    files: List[str] = []
+    dirs: List[str] = []
+    stack = [str(folder)]
+
+    while stack:
+        current = stack.pop()
+        dirs.append(current)
+        with os.scandir(current) as entries:
+            for entry in entries:
+                # 符号链接按文件处理，不进入其指向的目录
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    files.append(entry.path)
+
+    return files, dirs
+
+
+def remove_folders(folders: List[Path], dry_run: bool = False, max_workers: int = 32):
     """删除给定的文件夹列表。
 
+    文件通过线程池并行 os.unlink，随后自底向上 os.rmdir 已清空的目录。
+
     Args:
         folders (List[Path]): 待删除文件夹路径列表。
         dry_run (bool): 如果为 True，则仅打印将要删除的文件夹，不实际删除。
+        max_workers (int): 并行删除文件的线程数。
     """
-    for folder in folders:
-        if dry_run:
+    if dry_run:
+        for folder in folders:
             logger.info("[DRY-RUN] 将删除: %s", folder)
-            continue
+        return
 
-        try:
-            shutil.rmtree(folder)
-            logger.info("已删除: %s", folder)
-        except Exception as e:
-            logger.error("删除 %s 失败: %s", folder, e)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for folder in folders:
+            try:
+                files, dirs = collect_tree(folder)
+                # list() 消费结果，任一文件删除失败都会在此抛出
+                list(executor.map(os.unlink, files, chunksize=64))
+                for directory in reversed(dirs):
+                    os.rmdir(directory)
+                logger.info("已删除: %s", folder)
+            except Exception as e:
+                logger.error("删除 %s 失败: %s", folder, e)
 
 # --------------------------- 命令行接口 --------------------------- #
 
@@ -6,11 +6,33 @@
 """
 
 import os
+import importlib.util
+import itertools
 import json
+import mmap
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import logging
 
+try:
+    import orjson  # 可选依赖，解析更快
+except ImportError:
+    orjson = None
+
+# 安装了xlsxwriter（可选依赖，写入更快）时交给pandas使用，此处只检查是否可用，不导入
+EXCEL_ENGINE = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'openpyxl'
+
+# stage_distribution 中的阶段名 -> 面板数据列名
+STAGE_COLUMNS = {
+    'Awareness Stage': 'awareness_stage',
+    'Interest Stage': 'interest_stage',
+    'Consideration Stage': 'consideration_stage',
+    'Decision Stage': 'decision_stage',
+    'Fulfillment Stage': 'fulfillment_stage',
+    'Retention Stage': 'retention_stage',
+}
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -32,14 +54,18 @@ def find_scenarios_files(base_path):
         logger.error(f"路径不存在: {base_path}")
         return scenarios_files
     
-    # 遍历所有子目录
-    for company_dir in base_path.iterdir():
-        if company_dir.is_dir():
-            # 查找该目录下的scenarios.json文件
-            for file in company_dir.iterdir():
-                if file.is_file() and file.name.endswith('_scenarios.json'):
-                    scenarios_files.append(file)
-                    logger.info(f"找到文件: {file}")
+    # 遍历所有子目录（os.scandir 的 DirEntry 自带文件类型信息，无需逐个 stat）
+    with os.scandir(base_path) as company_entries:
+        for company_entry in company_entries:
+            if not company_entry.is_dir():
+                continue
+            # 查找该目录下的scenarios.json文件（先按文件名过滤，再判断类型）
+            with os.scandir(company_entry.path) as entries:
+                for entry in entries:
+                    if entry.name.endswith('_scenarios.json') and entry.is_file():
+                        file = Path(entry.path)
+                        scenarios_files.append(file)
+                        logger.info(f"找到文件: {file}")
     
     return scenarios_files
 
@@ -51,13 +77,19 @@ def parse_scenarios_json(file_path):
         file_path (Path): JSON文件路径
         
     Returns:
-        list: 包含面板数据行的列表，每行是一个字典
+        list: 每年一条原始记录（年份数据附加 url_id 与 year），由 create_panel_dataframe 统一展开
     """
-    panel_data = []
+    records = []
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # 以只读内存映射交给解析器，避免先拷贝成 bytes 对象
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson is not None:
+                # memoryview 须在 mmap 关闭前释放
+                with memoryview(mm) as view:
+                    data = orjson.loads(view)
+            else:
+                data = json.loads(mm[:])
         
         company_url = data.get('company_url', '')
         yearly_results = data.get('yearly_detailed_results', {})
@@ -69,37 +101,19 @@ def parse_scenarios_json(file_path):
                 logger.warning(f"跳过 {company_url} 年份 {year}，数据不完整")
                 continue
             
-            # 提取stage_distribution数据
-            stage_dist = year_data.get('stage_distribution', {})
-            
-            # 构建一行面板数据
-            row = {
-                'url_id': company_url,
-                'year': int(year),
-                'total_scenario_count': year_data.get('total_scenario_count', 0),
-                'awareness_stage': stage_dist.get('Awareness Stage', 0),
-                'interest_stage': stage_dist.get('Interest Stage', 0),
-                'consideration_stage': stage_dist.get('Consideration Stage', 0),
-                'decision_stage': stage_dist.get('Decision Stage', 0),
-                'fulfillment_stage': stage_dist.get('Fulfillment Stage', 0),
-                'retention_stage': stage_dist.get('Retention Stage', 0),
-                'page_success_rate': year_data.get('page_success_rate', '')
-            }
-            
-            panel_data.append(row)
-            logger.debug(f"处理 {company_url} 年份 {year}，场景数: {row['total_scenario_count']}")
+            records.append({**year_data, 'url_id': company_url, 'year': int(year)})
     
     except Exception as e:
         logger.error(f"解析文件 {file_path} 时出错: {e}")
     
-    return panel_data
+    return records
 
 def create_panel_dataframe(all_panel_data):
     """
     创建面板数据DataFrame
     
     Args:
-        all_panel_data (list): 所有面板数据行的列表
+        all_panel_data (list): 所有公司、所有年份的原始记录列表
         
     Returns:
         pd.DataFrame: 面板数据DataFrame
@@ -108,20 +122,23 @@ def create_panel_dataframe(all_panel_data):
         logger.warning("没有有效的数据")
         return pd.DataFrame()
     
-    df = pd.DataFrame(all_panel_data)
+    # 一次性展开嵌套的 stage_distribution（列名形如 stage_distribution.Awareness Stage）
+    df = pd.json_normalize(all_panel_data, sep='.')
+    
+    stage_source = {f'stage_distribution.{stage}': column for stage, column in STAGE_COLUMNS.items()}
+    df = df.reindex(columns=['url_id', 'year', 'total_scenario_count', *stage_source, 'page_success_rate'])
+    df = df.rename(columns=stage_source)
+    
+    # 缺失值与原逐行构建时的默认值一致
+    int_columns = ['total_scenario_count', *STAGE_COLUMNS.values()]
+    df[int_columns] = df[int_columns].fillna(0)
+    df['page_success_rate'] = df['page_success_rate'].fillna('')
     
     # 按公司和年份排序
     df = df.sort_values(['url_id', 'year']).reset_index(drop=True)
     
     # 数据类型优化
-    df['year'] = df['year'].astype(int)
-    df['total_scenario_count'] = df['total_scenario_count'].astype(int)
-    df['awareness_stage'] = df['awareness_stage'].astype(int)
-    df['interest_stage'] = df['interest_stage'].astype(int)
-    df['consideration_stage'] = df['consideration_stage'].astype(int)
-    df['decision_stage'] = df['decision_stage'].astype(int)
-    df['fulfillment_stage'] = df['fulfillment_stage'].astype(int)
-    df['retention_stage'] = df['retention_stage'].astype(int)
+    df[['year', *int_columns]] = df[['year', *int_columns]].astype(int)
     
     return df
 
@@ -133,30 +150,36 @@ def export_to_excel(df, output_path):
         df (pd.DataFrame): 面板数据DataFrame
         output_path (str): 输出文件路径
     """
+    tmp_path = None
     try:
         # 确保输出目录存在
         output_dir = Path(output_path).parent
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # 导出到Excel
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # 列宽按列整体计算（含表头），无需逐个单元格遍历
+        column_widths = [
+            min(max(int(df[column].astype(str).str.len().max()), len(str(column))) + 2, 50)
+            for column in df.columns
+        ]
+        
+        # 导出到Excel：先写同目录临时文件再 os.replace，中途失败或被打开读取时不会看到写了一半的文件
+        output_path = Path(output_path)
+        tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp{output_path.suffix}")
+        with pd.ExcelWriter(tmp_path, engine=EXCEL_ENGINE) as writer:
             df.to_excel(writer, sheet_name='Panel_Data', index=False)
             
             # 获取工作表对象以进行格式化
             worksheet = writer.sheets['Panel_Data']
             
             # 自动调整列宽
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
+            if EXCEL_ENGINE == 'xlsxwriter':
+                for idx, width in enumerate(column_widths):
+                    worksheet.set_column(idx, idx, width)
+            else:
+                from openpyxl.utils import get_column_letter
+                for idx, width in enumerate(column_widths, start=1):
+                    worksheet.column_dimensions[get_column_letter(idx)].width = width
+        os.replace(tmp_path, output_path)
         
         logger.info(f"成功导出到: {output_path}")
         logger.info(f"总计 {len(df)} 行数据")
@@ -165,6 +188,8 @@ def export_to_excel(df, output_path):
         
     except Exception as e:
         logger.error(f"导出Excel文件时出错: {e}")
+        if tmp_path is not None and tmp_path.exists():
+            tmp_path.unlink()
 
 def main():
     """
@@ -189,12 +214,12 @@ def main():
     
     logger.info(f"找到 {len(scenarios_files)} 个scenarios.json文件")
     
-    # 2. 解析所有JSON文件
-    all_panel_data = []
-    for file_path in scenarios_files:
-        logger.info(f"处理文件: {file_path}")
-        panel_data = parse_scenarios_json(file_path)
-        all_panel_data.extend(panel_data)
+    # 2. 多进程并行解析所有JSON文件（各文件相互独立）
+    max_workers = min(len(scenarios_files), os.cpu_count() or 1)
+    logger.info(f"使用 {max_workers} 个进程解析文件")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(parse_scenarios_json, scenarios_files, chunksize=8)
+        all_panel_data = list(itertools.chain.from_iterable(results))
     
     if not all_panel_data:
         logger.warning("没有有效的面板数据")
@@ -5,27 +5,236 @@ URL处理模块
 负责URL发现、筛选和按年保存
 """
 
-import json
+import codecs
+import functools
 import logging
 import os
 import re
+import threading
+import time
 import requests
-from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlsplit
 from bs4 import BeautifulSoup
-from typing import Dict, List, Set, Optional, Tuple
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Set, Optional, Tuple
 from datetime import datetime
+import json_io
+
+try:
+    import lxml.etree  # 可选依赖，C实现的增量HTML解析，提取链接更快
+except ImportError:
+    lxml = None
+
+# BeautifulSoup 解析器：安装了lxml时使用C实现的 lxml，否则使用纯Python的 html.parser
+_BS4_PARSER = 'lxml' if lxml is not None else 'html.parser'
+
+try:
+    import ahocorasick  # 可选依赖（pyahocorasick），错误提示语单遍线性扫描
+except ImportError:
+    ahocorasick = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser  # 可选依赖，C实现的DOM，提取正文比BeautifulSoup快
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import requests_cache  # 可选依赖，HTTP响应缓存到本地SQLite，重复抓取同一快照时直接读盘
+except ImportError:
+    requests_cache = None
+
+# 修正 urljoin 在 Wayback URL 中产生的 http:/、https:/（单斜杠）
+_SCHEME_FIX_RE = re.compile(r"(https?):/(?!/)")
+# Wayback URL 中被存档的真实站点（兼容单斜杠形式）
+_WAYBACK_SITE_RE = re.compile(r"/web/\d+/(https?:/{1,2}[^/]+)")
+# Wayback 主页路径中到被存档站点根目录为止的部分：/web/<时间戳>/http(s)://host/
+_WAYBACK_PREFIX_RE = re.compile(r"/web/\d+/https?://[^/?#]+/")
+# Wayback 典型错误页提示语（_is_url_reachable 命中两种及以上即视为不可用），合并为单个正则一次扫描
+_WAYBACK_ERROR_KEYWORDS = (
+    "got an http", "response at crawl time", "redirecting to", "impatient?",
+    "page cannot be crawled", "not in archive", "page not found", "robots.txt",
+    "this content is not available", "excluded from the wayback machine", "calendar not available",
+)
+_WAYBACK_ERROR_RE = re.compile("|".join(map(re.escape, _WAYBACK_ERROR_KEYWORDS)))
+# 每个Session的连接池大小
+_POOL_SIZE = 64
+# HTTP响应缓存（安装requests_cache时启用）：SQLite文件位置与默认有效期（秒）
+_HTTP_CACHE_NAME = os.path.join("outputs", ".http_cache")
+_HTTP_CACHE_EXPIRE = 86400 * 30
+
+
+@functools.lru_cache(maxsize=8192)
+def _extract_home_host_cached(url: str) -> str:
+    """提取URL对应的主域名（去除 www. 前缀）；页面内大量重复链接直接命中缓存"""
+    parsed = urlsplit(url)
+    host = parsed.netloc.lower()
+    
+    # Wayback 场景: host == web.archive.org，需要提取真实站点域名
+    if "web.archive.org" in host:
+        # 常见情况 /web/<数字时间戳>/http(s)://host/... 直接切片，其余（单斜杠等）交给正则
+        start = url.find("/web/") + 5
+        ts_end = url.find("/", start) if start >= 5 else -1
+        rest = url[ts_end + 1:] if ts_end > start and url[start:ts_end].isdigit() else ""
+        if rest.startswith(("http://", "https://")):
+            host_end = rest.find("/", rest.index("//") + 2)
+            return _strip_port_and_www(urlsplit(rest if host_end < 0 else rest[:host_end]).netloc.lower())
+
+        m = _WAYBACK_SITE_RE.search(url)
+        if m:
+            # 修正常见的 http:/、https:/ 错误
+            underlying = _SCHEME_FIX_RE.sub(r"\1://", m.group(1), count=1)
+            host = urlsplit(underlying).netloc.lower()
+
+    return _strip_port_and_www(host)
+
+
+def _strip_port_and_www(host: str) -> str:
+    """去掉端口号和 www. 前缀"""
+    # 去掉端口号
+    if ":" in host:
+        host = host.split(":")[0]
+    # 去掉 leading 'www.'
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+@functools.lru_cache(maxsize=None)
+def _wayback_error_automaton():
+    """将Wayback错误提示语构建为Aho-Corasick自动机（首次检查时才构建），未安装pyahocorasick时返回None"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in _WAYBACK_ERROR_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _iter_wayback_errors(snippet: str) -> Iterator[str]:
+    """逐个产出片段中命中的错误提示语（优先Aho-Corasick自动机，否则使用合并正则）"""
+    automaton = _wayback_error_automaton()
+    if automaton is not None:
+        for _, keyword in automaton.iter(snippet):
+            yield keyword
+    else:
+        for m in _WAYBACK_ERROR_RE.finditer(snippet):
+            yield m.group()
+
+
+def _site_prefix(url: str) -> Optional[str]:
+    """主页所在站点根目录的URL前缀（Wayback 主页包含 /web/<时间戳>/ 与被存档站点）；无法确定时返回None
+    
+    以该前缀开头的链接与主页必然同属一个主域名，无需再解析域名。
+    """
+    start = url.find("://") + 3
+    host_end = url.find("/", start) if start >= 3 else -1
+    if host_end < 0:
+        return None
+    if "web.archive.org" in url[start:host_end].lower():
+        m = _WAYBACK_PREFIX_RE.match(url, host_end)
+        return url[:m.end()] if m else None
+    return url[:host_end + 1]
+
+
+def _new_session(headers, cached: bool = False) -> requests.Session:
+    """创建带连接池与重试策略的Session（连接保持复用，瞬时网络错误自动重试）
+
+    cached=True 且安装了requests_cache时返回带本地缓存的Session：只缓存200响应，优先遵循服务器的
+    Cache-Control，缓存过期后请求失败时仍返回旧响应
+    """
+    if cached and requests_cache is not None:
+        session = requests_cache.CachedSession(
+            cache_name=_HTTP_CACHE_NAME,
+            backend='sqlite',
+            expire_after=_HTTP_CACHE_EXPIRE,
+            allowable_codes=(200,),
+            stale_if_error=True,
+            cache_control=True,
+        )
+    else:
+        session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(
+        pool_connections=_POOL_SIZE,
+        pool_maxsize=_POOL_SIZE,
+        max_retries=Retry(total=2, backoff_factor=0.3),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def _links_file_paths(company_url: str) -> Tuple[str, str, str]:
+    """公司链接输出路径：(输出目录, 过滤链接JSON, NDJSON检查点)"""
+    output_dir = os.path.join("outputs", company_url)
+    links_file = os.path.join(output_dir, f"{company_url}_filtered_links.json")
+    checkpoint_file = os.path.join(output_dir, f"{company_url}_filtered_links.ndjson")
+    return output_dir, links_file, checkpoint_file
+
+
+class _AnchorHrefCollector(HTMLParser):
+    """标准库增量HTML解析器：收集 <a>/<area> 标签的 href（未安装lxml时使用）"""
+    
+    def __init__(self):
+        super().__init__()
+        self.hrefs: List[str] = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('a', 'area'):
+            for name, value in attrs:
+                if name == 'href':
+                    self.hrefs.append(value)
+    
+    def pop_hrefs(self) -> List[str]:
+        """取出并清空已收集的href"""
+        hrefs, self.hrefs = self.hrefs, []
+        return hrefs
 
 
 class URLProcessor:
     """URL处理器"""
     
-    def __init__(self):
-        """初始化URL处理器"""
-        self.session = requests.Session()
-        self.session.headers.update({
+    # 每个线程使用独立的Session（以 self.session 的请求头为模板），避免线程间共享连接池；
+    # 挂在类上由所有实例共用，新建 URLProcessor 时不必重新进行 TCP/TLS 握手
+    _thread_local = threading.local()
+    
+    def __init__(self, http_cache: bool = False):
+        """初始化URL处理器
+
+        Args:
+            http_cache: 是否将链接发现与页面内容的HTTP响应缓存到 outputs/.http_cache（需安装requests_cache）；
+                URL可用性检查始终直接请求，不走缓存
+        """
+        self.logger = logging.getLogger(__name__)
+        
+        self.http_cache = http_cache and requests_cache is not None
+        if http_cache and requests_cache is None:
+            self.logger.warning("⚠️ 未安装requests_cache，HTTP响应缓存未启用")
+        elif self.http_cache:
+            self.logger.info(f"🗄️ 已启用HTTP响应缓存: {_HTTP_CACHE_NAME}")
+        
+        self.session = _new_session({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         
+        # 发现链接时单个页面最多读取的字节数（超出部分不再解析）
+        self.max_page_bytes = 20 * 1024 * 1024
+        
+        # 同一站点两次请求之间的最小间隔（秒），不同站点的请求互不等待；
+        # 各年份并发发现链接时几乎都请求 web.archive.org，由此统一限速
+        self.min_request_interval = 1.0
+        self._host_next_slot: Dict[str, float] = {}
+        self._rate_lock = threading.Lock()
+        # 同一站点同时进行中的请求数上限（线程数再多也不会对同一站点并发过多请求）
+        self.max_inflight_per_host = 4
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        
         # 排除的URL模式
         self.exclude_patterns = [
             r'\.pdf$', r'\.jpg$', r'\.png$', r'\.gif$', r'\.css$', r'\.js$',
@@ -33,81 +242,190 @@ class URLProcessor:
             r'/sitemap', r'/robots', r'/favicon', r'mailto:', r'tel:',
             r'#', r'javascript:'
         ]
+        # 合并为单个交替正则，每个URL只扫描一次（忽略大小写，无需先复制一份小写URL）
+        self._exclude_re = re.compile('|'.join(f'(?:{p})' for p in self.exclude_patterns), re.IGNORECASE)
         
-        self.logger = logging.getLogger(__name__)
+        # 技术文件扩展名与技术路径（结构过滤，_is_meaningful_url 使用）
+        self._structure_re = re.compile(
+            r'\.(?:css|js|png|jpe?g|gif|svg|ico|pdf|xml|json|txt|zip|woff|ttf)$'
+            r'|/(?:static|assets|css|js|images|img|fonts|media|resources|ajax|api)/',
+            re.IGNORECASE
+        )
+        
+        # 链接收集时使用的总过滤正则：排除模式 + 结构过滤，一次扫描完成全部判断
+        self._link_filter_re = re.compile(f'{self._exclude_re.pattern}|{self._structure_re.pattern}', re.IGNORECASE)
+    
+    @contextmanager
+    def _host_slot(self, url: str):
+        """占用站点的请求名额：同一站点最多 max_inflight_per_host 个请求同时进行，且相邻请求至少间隔 min_request_interval 秒"""
+        with self._host_semaphore(url):
+            self._wait_for_host_slot(url)
+            yield
+    
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        """获取站点对应的并发信号量"""
+        host = urlsplit(url).netloc.lower()
+        with self._rate_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_inflight_per_host)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    def _wait_for_host_slot(self, url: str):
+        """按站点预约请求时间片，未到时间片时等待"""
+        host = urlsplit(url).netloc.lower()
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._host_next_slot.get(host, 0.0))
+            self._host_next_slot[host] = slot + self.min_request_interval
+        
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _get_session(self, cached: bool = False) -> requests.Session:
+        """获取当前线程专用的Session（fork出的子进程不沿用父进程的连接）
+
+        Args:
+            cached: 为True时返回带HTTP响应缓存的Session（与普通Session分开保存）
+        """
+        local = self._thread_local
+        attr = "cached_session" if cached else "session"
+        entry = getattr(local, attr, None)
+        if entry is None or entry[1] != os.getpid():
+            entry = (_new_session(self.session.headers, cached=cached), os.getpid())
+            setattr(local, attr, entry)
+        return entry[0]
     
-    def process_urls_for_company(self, historical_urls: List[Tuple[str, str]], company_url: str) -> str:
+    def process_urls_for_company(self, historical_urls: List[Tuple[str, str]], company_url: str, max_workers: int = 8) -> str:
         """
         处理公司的所有历史URLs，按年筛选并保存
         
         Args:
             historical_urls: [(year, url), ...] 历史URL列表
             company_url: 公司URL标识符
+            max_workers: 并行处理年份的线程数
             
         Returns:
             输出文件路径
         """
         self.logger.info(f"🌐 开始处理公司URLs: {company_url}")
         
-        # 准备输出目录
-        output_dir = os.path.join("outputs", company_url)
+        # 输出目录与文件路径（逐年结果先追加到NDJSON检查点，全部完成后再汇总写出JSON）
+        output_dir, output_file, checkpoint_file = _links_file_paths(company_url)
         os.makedirs(output_dir, exist_ok=True)
         
-        # 输出文件路径
-        output_file = os.path.join(output_dir, f"{company_url}_filtered_links.json")
-        
         # 初始化或加载已存在结果，实现增量"断点续跑"
         year_links_map: Dict[str, List[str]] = {}
-        if os.path.exists(output_file):
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    year_links_map = data.get("year_links_map", {})
-                self.logger.info(
-                    f"🔄 发现已存在的链接文件: {output_file}，已加载 {len(year_links_map)} 年的数据，将进行增量处理"
-                )
-            except Exception as e:
-                self.logger.warning(f"⚠️ 读取已存在链接文件失败，将重新生成: {e}")
+        try:
+            data = json_io.load_file(output_file)
+            year_links_map = data.get("year_links_map", {})
+            self.logger.info(
+                f"🔄 发现已存在的链接文件: {output_file}，已加载 {len(year_links_map)} 年的数据，将进行增量处理"
+            )
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"⚠️ 读取已存在链接文件失败，将重新生成: {e}")
         
-        # 开始按年处理URLs（仅处理缺失或为空的年份）
+        # 上次中断时未汇总的年份结果
+        checkpoint_links = self._load_year_checkpoints(checkpoint_file)
+        if checkpoint_links:
+            year_links_map.update(checkpoint_links)
+            self.logger.info(f"🔄 从检查点恢复 {len(checkpoint_links)} 年的链接数据")
+        
+        # 按年汇总待处理的主页快照（仅处理缺失或为空的年份；同一年有多个快照时按顺序尝试）
+        pending_years: Dict[str, List[str]] = {}
         for year, homepage_url in historical_urls:
+            if year in pending_years:
+                pending_years[year].append(homepage_url)
+                continue
+            
             # 如果该年已经有非空链接，则跳过，实现增量处理
             if year in year_links_map and len(year_links_map[year]) > 0:
                 self.logger.info(f"⏭️ 跳过 {year} 年，已有 {len(year_links_map[year])} 个链接")
                 continue
-
+            
+            pending_years[year] = [homepage_url]
+        
+        # 各年份相互独立，多线程并行抓取；结果在主线程合并，每完成一年追加一条检查点
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_year = {
+                executor.submit(self._process_year_urls, year, homepage_urls): year
+                for year, homepage_urls in pending_years.items()
+            }
+            for future in as_completed(future_to_year):
+                year = future_to_year[future]
+                year_links_map[year] = future.result()
+                self._append_year_checkpoint(checkpoint_file, year, year_links_map[year])
+        
+        # 保存结果，汇总完成后检查点不再需要
+        self._write_links_file(output_file, company_url, year_links_map)
+        try:
+            os.remove(checkpoint_file)
+        except FileNotFoundError:
+            pass
+        
+        total_links = sum(len(links) for links in year_links_map.values())
+        self.logger.info(f"💾 链接处理完成，共 {total_links} 个链接已保存到: {output_file}")
+        
+        return output_file
+    
+    def _process_year_urls(self, year: str, homepage_urls: List[str]) -> List[str]:
+        """处理单年的URLs：按顺序尝试该年的主页快照，直到得到非空的有效链接"""
+        filtered_links: List[str] = []
+        
+        for homepage_url in homepage_urls:
             self.logger.info(f"🔍 处理 {year} 年的URLs...")
             
             try:
-                # 发现内部链接
-                internal_links = self.discover_internal_links(homepage_url, max_links=10000)
-                
-                # 过滤有效链接
-                filtered_links = self._filter_valid_links(internal_links)
-                
-                year_links_map[year] = filtered_links
+                # 发现内部链接（返回的链接已完成排除模式与结构过滤）
+                filtered_links = self.discover_internal_links(homepage_url, max_links=10000)
                 
                 self.logger.info(f"✅ {year} 年处理完成: {len(filtered_links)} 个有效链接")
                 
             except Exception as e:
                 self.logger.error(f"❌ {year} 年处理失败: {e}")
-                year_links_map[year] = []
+                filtered_links = []
+            
+            if filtered_links:
+                break
         
-        # 保存结果
+        return filtered_links
+    
+    def _append_year_checkpoint(self, checkpoint_file: str, year: str, links: List[str]):
+        """将单年链接追加为NDJSON检查点中的一行"""
+        try:
+            with open(checkpoint_file, 'ab') as f:
+                f.write(json_io.dumps({"year": year, "links": links}, indent=False) + b"\n")
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入链接检查点失败: {e}")
+    
+    def _load_year_checkpoints(self, checkpoint_file: str) -> Dict[str, List[str]]:
+        """读取NDJSON检查点，返回 {year: links}；中断时写了一半的行直接跳过"""
+        results: Dict[str, List[str]] = {}
+        try:
+            with open(checkpoint_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json_io.loads(line)
+                        results[record["year"]] = record["links"]
+                    except Exception:
+                        continue
+        except FileNotFoundError:
+            pass
+        return results
+    
+    def _write_links_file(self, output_file: str, company_url: str, year_links_map: Dict[str, List[str]], indent: bool = True):
+        """写入过滤链接文件（年份按顺序排列）"""
         result_data = {
             "generation_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "company_url": company_url,
             "total_years": len(year_links_map),
-            "year_links_map": year_links_map
+            "year_links_map": dict(sorted(year_links_map.items()))
         }
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
-        
-        total_links = sum(len(links) for links in year_links_map.values())
-        self.logger.info(f"💾 链接处理完成，共 {total_links} 个链接已保存到: {output_file}")
-        
-        return output_file
+        json_io.dump_file(output_file, result_data, indent=indent)
     
     def discover_internal_links(self, homepage_url: str, max_links: int = 10000) -> List[str]:
         """
@@ -123,151 +441,136 @@ class URLProcessor:
         self.logger.info(f"🔍 开始发现URL: {homepage_url}")
         
         try:
-            # 获取主页内容
-            response = self.session.get(homepage_url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # 流式获取主页内容，边下载边解析，达到 max_links 后即停止读取
+            with self._host_slot(homepage_url):
+                response = self._get_session(cached=self.http_cache).get(homepage_url, timeout=15, stream=True)
+                try:
+                    response.raise_for_status()
+                    discovered_links = self._collect_internal_links(homepage_url, response, max_links)
+                finally:
+                    response.close()
             
-            home_host = self._extract_home_host(homepage_url)
-            discovered_links = set([homepage_url])  # 包含主页本身
-            
-            # 提取所有链接
-            for a_tag in soup.find_all(['a', 'area'], href=True):
-                href = a_tag.get('href')
-                if not href:
-                    continue
-                
-                # 转换为完整URL
-                full_url = urljoin(homepage_url, href)
-                
-                # 修复 urljoin 在 Wayback URL 中的问题
-                if "/web/" in full_url and "http:/" in full_url and "http://" not in full_url:
-                    full_url = full_url.replace("http:/", "http://")
-                if "/web/" in full_url and "https:/" in full_url and "https://" not in full_url:
-                    full_url = full_url.replace("https:/", "https://")
-                
-                # 提取候选链接的真实主域名
-                candidate_host = self._extract_home_host(full_url)
-
-                # 过滤同主域名
-                if candidate_host == "" or candidate_host == home_host:
-                    # 清理URL
-                    clean_url = full_url.split("#")[0]  # 移除 fragment
-                    
-                    # 检查是否应该包含
-                    if self._should_include_url(clean_url):
-                        discovered_links.add(clean_url)
-                        
-                        if len(discovered_links) >= max_links:
-                            break
-            
-            result = list(discovered_links)
-            self.logger.info(f"✅ 发现 {len(result)} 个内部链接")
-            return result
+            self.logger.info(f"✅ 发现 {len(discovered_links)} 个内部链接")
+            return discovered_links
             
         except Exception as e:
             self.logger.error(f"❌ 发现URL时出错: {e}")
+            return []
+    
+    def _collect_internal_links(self, homepage_url: str, response: "requests.Response", max_links: int) -> List[str]:
+        """从流式响应中提取同站且通过过滤的链接（按发现顺序去重）"""
+        home_host = self._extract_home_host(homepage_url)
+        home_prefix = _site_prefix(homepage_url)
+        # dict 保持插入顺序，结果在多次运行间可复现
+        discovered_links: Dict[str, None] = {homepage_url: None} if self._is_meaningful_url(homepage_url) else {}  # 包含主页本身
+        link_filter = self._link_filter_re.search
+        
+        # 仅采用响应头中声明的charset（requests 对未声明的 text/html 默认返回 ISO-8859-1，不可信）
+        content_type = response.headers.get('Content-Type', '')
+        encoding = response.encoding if 'charset' in content_type.lower() and response.encoding else None
+        
+        # 提取所有链接
+        for href in self._iter_anchor_hrefs(self._iter_response_chunks(response), encoding):
+            # 先移除 fragment：仅含 fragment 的锚点（#top 等）指向主页本身，已在初始结果中处理
+            href = href.partition("#")[0] if href else href
+            if not href:
+                continue
+            
+            # 转换为完整URL
+            full_url = urljoin(homepage_url, href)
+            
+            # 修复 urljoin 在 Wayback URL 中的问题
+            if "/web/" in full_url:
+                full_url = _SCHEME_FIX_RE.sub(r"\1://", full_url)
+            
+            # 过滤同主域名（与主页同前缀的链接直接通过，其余再提取真实主域名比较）
+            if (home_prefix is not None and full_url.startswith(home_prefix)) or \
+                    self._extract_home_host(full_url) in ("", home_host):
+                # 检查是否应该包含（排除模式与技术文件/路径一并过滤）
+                if full_url not in discovered_links and link_filter(full_url) is None:
+                    discovered_links[full_url] = None
+                    
+                    if len(discovered_links) >= max_links:
+                        break
+        
+        return list(discovered_links)
+    
+    def _iter_response_chunks(self, response: "requests.Response", chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """按块读取响应体，累计超过 max_page_bytes 后停止"""
+        received = 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            yield chunk
+            received += len(chunk)
+            if received >= self.max_page_bytes:
+                self.logger.warning(f"⚠️ 页面超过 {self.max_page_bytes} 字节，其余内容不再解析: {response.url}")
+                break
+    
+    def _iter_anchor_hrefs(self, chunks: Iterable[bytes], encoding: Optional[str] = None) -> Iterator[str]:
+        """增量解析HTML，逐个产出 <a>/<area> 标签的 href（优先lxml，未安装时使用标准库HTMLParser）
+        
+        encoding 为响应头声明的编码：lxml 据此跳过编码探测（未声明时由其按 <meta charset> 探测），标准库解析器未声明时按UTF-8解码。
+        """
+        if lxml is not None:
+            parser = lxml.etree.HTMLPullParser(
+                events=('start',), tag=('a', 'area'),
+                encoding=encoding, huge_tree=True, remove_comments=True, remove_pis=True,
+            )
+            for chunk in chunks:
+                parser.feed(chunk)
+                for _, element in parser.read_events():
+                    yield element.get('href')
+            try:
+                parser.close()
+            except lxml.etree.LxmlError:
+                pass  # 空文档等无法构建文档树时忽略，已产出的链接不受影响
+            for _, element in parser.read_events():
+                yield element.get('href')
             return
+        
+        collector = _AnchorHrefCollector()
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        for chunk in chunks:
+            collector.feed(decoder.decode(chunk))
+            yield from collector.pop_hrefs()
+        collector.feed(decoder.decode(b'', final=True))
+        collector.close()
+        yield from collector.pop_hrefs()
     
     def _extract_home_host(self, url: str) -> str:
         """提取主页对应的主域名（去除 www. 前缀）"""
-        parsed = urlparse(url)
-        host = parsed.netloc.lower()
-        
-        # Wayback 场景: host == web.archive.org，需要提取真实站点域名
-        if "web.archive.org" in host:
-            m = re.search(r"/web/\d+/(https?://[^/]+)", url)
-            if m:
-                underlying = m.group(1)
-                # 修正常见的 http:/、https:/ 错误
-                if underlying.startswith("http:/") and not underlying.startswith("http://"):
-                    underlying = underlying.replace("http:/", "http://", 1)
-                if underlying.startswith("https:/") and not underlying.startswith("https://"):
-                    underlying = underlying.replace("https:/", "https://", 1)
-                host = urlparse(underlying).netloc.lower()
-        
-        # 去掉端口号
-        if ":" in host:
-            host = host.split(":")[0]
-        # 去掉 leading 'www.'
-        if host.startswith("www."):
-            host = host[4:]
-        return host
+        return _extract_home_host_cached(url)
     
     def _should_include_url(self, url: str) -> bool:
         """判断是否应该包含该URL"""
-        url_lower = url.lower()
-        
         # 排除不需要的URL
-        for pattern in self.exclude_patterns:
-            if re.search(pattern, url_lower):
-                return False
-        
-        return True
+        return self._exclude_re.search(url) is None
     
-    def _filter_valid_links(self, links: List[str]) -> List[str]:
-        """过滤有效链接：只过滤技术文件，不进行内容检查"""
-        valid_links: List[str] = []
-
-        for link in links:
-            if not self._is_meaningful_url(link):
-                self.logger.debug(f"🚫 [Structure] {link}")
-                continue
-        
-            # if not self._is_url_reachable(link):
-            #     self.logger.debug(f"🚫 [Unreachable] {link}")
-            #     continue
-
-            valid_links.append(link)
-            self.logger.debug(f"✅ Valid URL: {link}")
-
-        self.logger.info(
-            f"✅ URL过滤完成: {len(valid_links)}/{len(links)} 链接通过结构过滤"
-        )
-        return valid_links
-
     def _is_meaningful_url(self, url: str) -> bool:
-        """基于URL结构判断是否有意义（过滤技术文件）"""
-        # 过滤明显的技术文件和静态资源
-        excluded_extensions = ['.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', 
-                             '.pdf', '.xml', '.json', '.txt', '.zip', '.woff', '.ttf']
-        excluded_paths = ['/static/', '/assets/', '/css/', '/js/', '/images/', '/img/', 
-                         '/fonts/', '/media/', '/resources/', '/ajax/', '/api/']
-        
-        url_lower = url.lower()
-        
-        # 排除技术文件扩展名
-        if any(url_lower.endswith(ext) for ext in excluded_extensions):
-            return False
-        
-        # 排除技术路径
-        if any(path in url_lower for path in excluded_paths):
-            return False
-        
-        return True
+        """基于URL结构判断是否有意义（过滤技术文件扩展名与技术路径）"""
+        return self._structure_re.search(url) is None
 
     def _is_url_reachable(self, url: str) -> bool:
         """快速判断 URL 是否可访问且非典型错误页。
         仅下载少量 HTML；若状态码不在 200-399 范围或命中 Wayback 典型错误提示，则判定为不可用。"""
 
         try:
-            import requests  # 延迟导入，避免顶层依赖
-
-            resp = self.url_discovery.session.get(url, timeout=10, allow_redirects=True, stream=True)
-            if resp.status_code >= 400:
-                return False
-
-            # 读取前 2KB 文本用于错误检测
-            snippet = resp.text[:2048].lower()
+            resp = self._get_session().get(url, timeout=10, allow_redirects=True, stream=True)
+            try:
+                if resp.status_code >= 400:
+                    return False
 
-            wayback_errors = [
-                "got an http", "response at crawl time", "redirecting to", "impatient?",
-                "page cannot be crawled", "not in archive", "page not found", "robots.txt",
-                "this content is not available", "excluded from the wayback machine", "calendar not available"
-            ]
+                # 只读取前 2KB 用于错误检测，不下载完整页面
+                head = next(resp.iter_content(chunk_size=2048), b"")
+            finally:
+                resp.close()
 
-            hits = sum(1 for kw in wayback_errors if kw in snippet)
-            return hits < 2
+            snippet = head[:2048].decode(resp.encoding or "utf-8", errors="replace").lower()
+            hits = set()
+            for keyword in _iter_wayback_errors(snippet):
+                hits.add(keyword)
+                if len(hits) >= 2:
+                    return False
+            return True
 
         except Exception:
             return False
@@ -275,20 +578,23 @@ class URLProcessor:
     def get_page_content(self, url: str, max_length: Optional[int] = 3000) -> Optional[str]:
         """获取页面内容用于分析"""
         try:
-            response = self.session.get(url, timeout=15)
+            with self._host_slot(url):
+                response = self._get_session(cached=self.http_cache).get(url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
             
-            # 移除脚本和样式标签
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # 获取主要文本内容
-            text = soup.get_text()
-            # 清理文本
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            # 移除脚本和样式标签，获取主要文本内容
+            if LexborHTMLParser is not None:
+                tree = LexborHTMLParser(response.content)
+                for script in tree.css("script, style"):
+                    script.decompose()
+                text = tree.root.text() if tree.root is not None else ""
+            else:
+                soup = BeautifulSoup(response.content, _BS4_PARSER)
+                for script in soup(["script", "style"]):
+                    script.decompose()
+                text = soup.get_text()
+            # 清理文本：连续空白（含换行、制表符）压缩为单个空格，str.split 在C层一次完成
+            text = ' '.join(text.split())
             
             # 根据 max_length 限制文本长度
             if max_length is not None and len(text) > max_length:
@@ -302,21 +608,18 @@ class URLProcessor:
 
     def load_filtered_links(self, company_url: str) -> Dict[str, List[str]]:
         """加载已保存的过滤链接"""
-        output_dir = os.path.join("outputs", company_url)
-        links_file = os.path.join(output_dir, f"{company_url}_filtered_links.json")
-        
-        if not os.path.exists(links_file):
-            self.logger.error(f"❌ 链接文件不存在: {links_file}")
-            return {}
+        _, links_file, _ = _links_file_paths(company_url)
         
         try:
-            with open(links_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = json_io.load_file(links_file)
             
             year_links_map = data.get("year_links_map", {})
             self.logger.info(f"✅ 成功加载 {len(year_links_map)} 年的链接数据")
             return year_links_map
             
+        except FileNotFoundError:
+            self.logger.error(f"❌ 链接文件不存在: {links_file}")
+            return {}
         except Exception as e:
             self.logger.error(f"❌ 加载链接文件失败: {e}")
             return {}
@@ -3,81 +3,227 @@
 """
 Visualization of scenario analysis results.
 Generates line and bar charts showing total scenarios per year and distribution per stage.
-Requires pandas and matplotlib.
+Requires matplotlib (and numpy, which it depends on).
 """
 
-import json
+import hashlib
+import itertools
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def visualize_scenario_results(output_dir, company_url):
+import json_io
+
+try:
+    import ijson  # optional: stream yearly results instead of materializing the whole document
+except ImportError:
+    ijson = None
+
+try:
+    import xxhash  # optional: faster content hash for the render cache
+except ImportError:
+    xxhash = None
+
+# Per-company input / output file names
+_RESULT_FMT = "{}_scenario_v0.4.4_result.json"
+_VIS_FMT = "{}_scenario_visualization.png"
+
+# Figure reused across calls (cleared and redrawn instead of allocating a new one)
+_FIG = None
+
+
+def _file_digest(path):
+    """Content hash of a file (xxh3 when installed, blake2b otherwise), read in 1 MiB chunks."""
+    h = xxhash.xxh3_64() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _iter_yearly_results(json_path):
+    """Yield (year, total_scenario_count, stage_distribution) for each year in the result file."""
+    if ijson is not None:
+        with open(json_path, 'rb') as f:
+            for year, payload in ijson.kvitems(f, "yearly_detailed_results"):
+                yield year, payload["total_scenario_count"], payload["stage_distribution"]
+        return
+
+    # json_io parses with orjson when installed (stdlib json otherwise)
+    data = json_io.load_file(json_path)
+    for year, payload in data.get("yearly_detailed_results", {}).items():
+        yield year, payload["total_scenario_count"], payload["stage_distribution"]
+
+
+def _prepare_chart(output_dir, company_url):
     """
-    Reads scenario analysis JSON and generates visualization:
-    1. Line chart of total scenarios per year.
-    2. Bar chart of scenario distribution per stage per year.
-    Saves figure to outputs directory.
+    Parses one company's result JSON into the arrays needed for plotting.
+    Returns None when there is nothing to render (missing file, unchanged input, no yearly results).
+    Safe to call from worker threads: no matplotlib state is touched here.
     """
-    json_path = os.path.join(output_dir, f"{company_url}_scenario_v0.4.4_result.json")
+    json_path = os.path.join(output_dir, _RESULT_FMT.format(company_url))
     if not os.path.exists(json_path):
         print(f"Result JSON file not found: {json_path}")
-        return
+        return None
+
+    # Skip parsing and rendering when the PNG was already rendered from identical JSON
+    output_file = os.path.join(output_dir, _VIS_FMT.format(company_url))
+    hash_file = f"{output_file}.hash"
+    digest = _file_digest(json_path)
+    try:
+        with open(hash_file, 'r', encoding='utf-8') as f:
+            if f.read().strip() == digest and os.path.exists(output_file):
+                print(f"Visualization is up to date: {output_file}")
+                return None
+    except FileNotFoundError:
+        pass
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Only the per-year totals and stage distributions are kept
+    totals_by_year = {}
+    stages_by_year = {}
+    for year, total, stage_distribution in _iter_yearly_results(json_path):
+        totals_by_year[year] = total
+        stages_by_year[year] = stage_distribution
 
-    yearly_results = data.get("yearly_detailed_results", {})
-    if not yearly_results:
+    if not totals_by_year:
         print("No yearly results found in JSON.")
-        return
+        return None
+
+    # Deferred import: missing, empty or up-to-date results never pay for numpy
+    import numpy as np
 
     # Sort years
-    years = sorted(yearly_results.keys())
-
-    # Total scenarios per year
-    totals = [yearly_results[year]["total_scenario_count"] for year in years]
-
-    # Build DataFrame for total scenarios
-    df_total = pd.DataFrame({
-        "Year": years,
-        "Total Scenarios": totals
-    })
-
-    # Stage distribution DataFrame
-    first_year = years[0]
-    stage_names = list(yearly_results[first_year]["stage_distribution"].keys())
-    stage_data = {
-        stage: [yearly_results[year]["stage_distribution"].get(stage, 0) for year in years]
-        for stage in stage_names
+    years = sorted(totals_by_year)
+
+    # Union of all years' stages in first-seen order (journey order of the earliest year, then any
+    # stage that only appears later); stages missing in a year count as 0
+    stage_names = list(dict.fromkeys(itertools.chain.from_iterable(stages_by_year[year] for year in years)))
+    stage_index = {stage: i for i, stage in enumerate(stage_names)}
+
+    # Scenario counts are small, int32 is plenty. Totals go through fromiter with a known count
+    # (one fixed-size allocation, no per-element ndarray indexing); the stage matrix is filled in one pass
+    totals = np.fromiter((totals_by_year[year] for year in years), dtype=np.int32, count=len(years))
+    stage_matrix = np.zeros((len(stage_names), len(years)), dtype=np.int32)
+    for j, year in enumerate(years):
+        for stage, count in stages_by_year[year].items():
+            stage_matrix[stage_index[stage], j] = count
+
+    return {
+        "output_file": output_file,
+        "hash_file": hash_file,
+        "digest": digest,
+        "years": years,
+        "totals": totals,
+        "stage_names": stage_names,
+        "stage_matrix": stage_matrix,
     }
-    df_stages = pd.DataFrame(stage_data, index=years)
+
+
+def _render_chart(chart):
+    """
+    Draws a prepared chart on the shared module-level Figure and saves it.
+    Must run on one thread only (matplotlib is not thread-safe).
+    """
+    # Deferred imports: only paid once something is actually rendered
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')  # PNG output only: skip the interactive backend probe
+    import matplotlib.pyplot as plt
+
+    years = chart["years"]
+    stage_matrix = chart["stage_matrix"]
+    output_file = chart["output_file"]
 
     # Plotting
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure(figsize=(12, 10))
+    else:
+        _FIG.clear()
+    ax1, ax2 = _FIG.subplots(2, 1)
+    # Fixed margins for this known layout instead of tight_layout (no layout reflow pass);
+    # the right margin leaves room for the stage legend placed outside the bar chart
+    _FIG.subplots_adjust(left=0.08, right=0.78, top=0.95, bottom=0.1, hspace=0.3)
+
+    # Both charts use integer year positions with known bounds, so limits are set up front and
+    # autoscaling (a datalim pass over every artist) is switched off
+    totals = chart["totals"]
+    positions = np.arange(len(years))
+    last = max(len(years) - 1, 1)
 
     # Line Chart: Total scenarios per year
-    ax1.plot(df_total["Year"], df_total["Total Scenarios"], marker='o', linestyle='-')
+    ax1.set_autoscale_on(False)
+    ax1.set_xlim(-0.05 * last, (len(years) - 1) + 0.05 * last)
+    ax1.set_ylim(0, max(int(totals.max()), 1) * 1.05)
+    ax1.plot(positions, totals, marker='o', linestyle='-')
+    ax1.set_xticks(positions)
+    ax1.set_xticklabels(years)
     ax1.set_title("Total Scenarios Identified per Year")
     ax1.set_xlabel("Year")
     ax1.set_ylabel("Total Scenarios")
     ax1.grid(True)
 
-    # Bar Chart: Stage distribution per year
-    df_stages.plot(kind='bar', stacked=True, ax=ax2)
+    # Bar Chart: Stage distribution per year (stacked bars; each stage sits on the cumulative sum of the stages below it)
+    cumulative = np.cumsum(stage_matrix, axis=0, dtype=np.int32)
+    bottoms = cumulative - stage_matrix
+    ax2.set_autoscale_on(False)
+    ax2.set_xlim(-0.5, len(years) - 0.5)
+    ax2.set_ylim(0, max(int(cumulative[-1].max()) if len(cumulative) else 0, 1) * 1.05)
+    for stage, counts, bottom in zip(chart["stage_names"], stage_matrix, bottoms):
+        ax2.bar(positions, counts, width=0.5, bottom=bottom, label=stage)
+    ax2.set_xticks(positions)
+    ax2.set_xticklabels(years, rotation=90)
     ax2.set_title("Scenario Distribution per Stage per Year")
     ax2.set_xlabel("Year")
     ax2.set_ylabel("Scenario Count")
     ax2.legend(title="Stage", bbox_to_anchor=(1.05, 1), loc='upper left')
 
-    plt.tight_layout()
-    output_file = os.path.join(output_dir, f"{company_url}_scenario_visualization.png")
-    plt.savefig(output_file)
+    # Fast zlib level: the PNG gets somewhat larger, but encoding is the slowest part of savefig
+    _FIG.savefig(output_file, dpi=100, pil_kwargs={"compress_level": 1})
+    with open(chart["hash_file"], 'w', encoding='utf-8') as f:
+        f.write(chart["digest"])
     print(f"Visualization saved to: {output_file}")
 
+
+def visualize_scenario_results(output_dir, company_url):
+    """
+    Reads scenario analysis JSON and generates visualization:
+    1. Line chart of total scenarios per year.
+    2. Bar chart of scenario distribution per stage per year.
+    Saves figure to outputs directory.
+    """
+    chart = _prepare_chart(output_dir, company_url)
+    if chart is not None:
+        _render_chart(chart)
+
+
+def visualize_many(output_dir, company_urls, max_workers=None):
+    """
+    Visualizes several companies in one process.
+    JSON parsing and matrix building run in a thread pool; each chart is rendered on the main
+    thread (reusing the one Figure) as soon as its data is ready.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_company = {
+            executor.submit(_prepare_chart, output_dir, company_url): company_url
+            for company_url in company_urls
+        }
+        for future in as_completed(future_to_company):
+            company_url = future_to_company[future]
+            try:
+                chart = future.result()
+                if chart is not None:
+                    _render_chart(chart)
+            except Exception as e:
+                print(f"Visualization failed for {company_url}: {e}")
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Visualize scenario analysis results")
     parser.add_argument("--output-dir", type=str, default="./outputs", help="Directory containing JSON result file")
-    parser.add_argument("--company-url", type=str, required=True, help="Company URL identifier")
+    parser.add_argument("--company-url", type=str, nargs='+', required=True, help="Company URL identifier(s)")
     args = parser.parse_args()
-    visualize_scenario_results(args.output_dir, args.company_url) 
\ No newline at end of file
+    if len(args.company_url) == 1:
+        visualize_scenario_results(args.output_dir, args.company_url[0])
+    else:
+        visualize_many(args.output_dir, args.company_url)